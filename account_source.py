@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+LeafLow account sources
+账号来源
+
+除 config.accounts.json 中的 accounts 列表外，还支持 JSONL 账号文件（每行一个账号）。
+JSONL 文件按行惰性读取并逐条校验，账号数量再多也不需要一次性载入内存；
+格式错误的行记录警告后跳过，不影响其他账号。
+"""
+
+import hashlib
+import json
+
+
+class AccountRecordError(ValueError):
+    """账号记录格式错误"""
+
+
+def is_session_cookie(name):
+    """登录状态所依赖的 Cookie：leaflow_session 和 remember_web_*"""
+    return name == 'leaflow_session' or is_remember_cookie(name)
+
+
+def is_remember_cookie(name):
+    """长期有效的 "记住我" Cookie；leaflow_session 会被站点轮换，不适合作为标识"""
+    return name.startswith('remember_web_')
+
+
+def session_identity(cookies):
+    """按会话 Cookie 计算的账号标识：优先 remember_web_*，没有时退回 leaflow_session，都没有时返回 None"""
+    cookies = cookies or {}
+    names = sorted(name for name in cookies if is_remember_cookie(name))
+    if not names and 'leaflow_session' in cookies:
+        names = ['leaflow_session']
+    if not names:
+        return None
+    digest = hashlib.sha1(str(cookies[names[0]]).encode('utf-8')).hexdigest()
+    return f"cookie:{digest[:16]}"
+
+
+def validate_account(account):
+    """校验单个账号记录，格式错误时抛出 AccountRecordError"""
+    if not isinstance(account, dict):
+        raise AccountRecordError("account record must be a JSON object")
+
+    token_data = account.get('token_data')
+    if not isinstance(token_data, dict):
+        raise AccountRecordError("missing token_data object")
+
+    cookies = token_data.get('cookies', {})
+    headers = token_data.get('headers', {})
+    if not isinstance(cookies, dict) or not isinstance(headers, dict):
+        raise AccountRecordError("token_data.cookies and token_data.headers must be objects")
+    if not cookies and not headers:
+        raise AccountRecordError("token_data has neither cookies nor headers")
+    for name, value in list(cookies.items()) + list(headers.items()):
+        if not isinstance(value, str):
+            raise AccountRecordError(f"value of '{name}' must be a string")
+
+    if not isinstance(account.get('proxy') or '', str):
+        raise AccountRecordError("proxy must be a URL string")
+    if not isinstance(account.get('enabled', True), bool):
+        raise AccountRecordError("enabled must be true or false")
+    return account
+
+
+class JsonlAccountSource:
+    """JSONL 账号文件：每次遍历重新打开文件，按行返回 (序号, 账号配置)"""
+
+    def __init__(self, path, logger=None):
+        self.path = path
+        self.logger = logger
+
+    def __iter__(self):
+        # 序号按非空行计数（包括格式错误的行），保证账号名称与文件中的位置对应
+        account_index = 0
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line_number, line in enumerate(f, 1):
+                line = line.strip()
+                if not line or line.startswith('#'):
+                    continue
+                try:
+                    account = validate_account(json.loads(line))
+                except (ValueError, AccountRecordError) as e:
+                    if self.logger is not None:
+                        self.logger.warning("⚠️ Skipping invalid account record at %s:%s: %s", self.path, line_number, e)
+                else:
+                    yield account_index, account
+                account_index += 1
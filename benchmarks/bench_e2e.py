@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Offline end-to-end benchmark for checkin_token.py
+离线端到端性能测试
+
+启动本地模拟站点，用大量合成账号运行 LeafLowTokenCheckin，
+输出 accounts/sec、每账号请求数、p50/p95 耗时和峰值内存，便于对比热路径改动前后的表现。
+
+用法：
+    python benchmarks/bench_e2e.py --accounts 2000 --concurrency 32 --latency-ms 20
+"""
+
+import argparse
+import contextlib
+import json
+import math
+import os
+import sys
+import tempfile
+import time
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from leaflow_stub import LeafLowStub, StubSettings  # noqa: E402
+from proxy_stub import StubProxy  # noqa: E402
+
+
+def peak_rss_mb():
+    """进程峰值常驻内存（MB）"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 单位为 KB，macOS 为字节
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def percentile(values, fraction):
+    """最近秩法计算分位数"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+def synthetic_account(index):
+    return {"token_data": {"cookies": {
+        "leaflow_session": f"bench-session-{index}",
+        "XSRF-TOKEN": f"bench-xsrf-{index}",
+    }}}
+
+
+def write_config(path, stub, args, proxies=()):
+    """生成指向模拟站点的账号配置；--accounts-format jsonl 时账号写入单独的 JSONL 文件"""
+    config = {
+        "settings": {
+            "log_level": args.log_level,
+            "retry_delay": 0,
+            "timeout": 30,
+            "concurrency": args.concurrency,
+            "main_site": stub.main_site,
+            "checkin_url": stub.checkin_url,
+            "state_dir": os.path.join(os.path.dirname(path), 'state'),
+            "user_agent": "LeafLowBenchmark/1.0",
+            # 默认测量不限速时的吞吐；--rate-limit 启用自适应限速
+            "rate_limit": args.rate_limit,
+        },
+    }
+    if proxies:
+        config["settings"]["proxies"] = [proxy.url for proxy in proxies]
+    if args.accounts_format == 'jsonl':
+        accounts_file = os.path.join(os.path.dirname(path), 'accounts.jsonl')
+        with open(accounts_file, 'w', encoding='utf-8') as f:
+            for index in range(args.accounts):
+                f.write(json.dumps(synthetic_account(index)) + '\n')
+        config["settings"]["accounts_file"] = accounts_file
+    else:
+        config["accounts"] = [synthetic_account(index) for index in range(args.accounts)]
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(config, f)
+
+
+def run_benchmark(args):
+    """运行一次基准测试并返回报告"""
+    settings = StubSettings(
+        latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, error_rate=args.error_rate,
+        page_size=args.page_size, expired_rate=args.expired_rate,
+        already_rate=args.already_rate, api_only_rate=args.api_only_rate,
+        rate_limit=args.server_rate_limit, seed=args.seed,
+    )
+    workdir = tempfile.mkdtemp(prefix='leaflow-bench-')
+    previous_cwd = os.getcwd()
+
+    with LeafLowStub(settings) as stub, contextlib.ExitStack() as stack:
+        # 第一个代理使用 --proxy-failure-rate，其余代理正常
+        proxies = [
+            stack.enter_context(StubProxy(
+                latency_ms=args.proxy_latency_ms, failure_rate=args.proxy_failure_rate if index == 0 else 0.0,
+                seed=args.seed + index,
+            ))
+            for index in range(args.proxies)
+        ]
+        config_path = os.path.join(workdir, 'config.accounts.json')
+        write_config(config_path, stub, args, proxies)
+
+        # 日志文件写到临时目录
+        os.chdir(workdir)
+        try:
+            from checkin_token import LeafLowTokenCheckin
+
+            checkin = LeafLowTokenCheckin(config_path)
+            durations = []
+            perform = checkin.perform_token_checkin
+
+            def timed_checkin(*call_args, **call_kwargs):
+                started = time.perf_counter()
+                try:
+                    return perform(*call_args, **call_kwargs)
+                finally:
+                    durations.append(time.perf_counter() - started)
+
+            checkin.perform_token_checkin = timed_checkin
+
+            started = time.perf_counter()
+            success_count, total_count, results = checkin.run_all_accounts()
+            elapsed = time.perf_counter() - started
+        finally:
+            os.chdir(previous_cwd)
+
+        server = stub.state.snapshot()
+        proxy_traffic = {proxy.url: proxy.stats.snapshot() for proxy in proxies}
+
+    request_total = sum(result.get('requests', 0) for result in results)
+    report = {
+        'accounts': total_count,
+        'successful': success_count,
+        'concurrency': args.concurrency,
+        'elapsed_seconds': round(elapsed, 3),
+        'accounts_per_second': round(total_count / elapsed, 2) if elapsed else None,
+        'requests_per_account': round(request_total / total_count, 2) if total_count else 0,
+        'latency_p50_ms': round(percentile(durations, 0.50) * 1000, 1),
+        'latency_p95_ms': round(percentile(durations, 0.95) * 1000, 1),
+        'peak_rss_mb': round(peak_rss_mb(), 1) if resource is not None else None,
+        'server_requests': server['requests'],
+        'server_errors': server['errors'],
+        'server_bytes_sent': server['bytes_sent'],
+        'server_throttled': server['throttled'],
+    }
+    if checkin.transport is not None:
+        report['transport'] = checkin.transport.stats()
+    if checkin.metrics.rate_limits:
+        report['rate_limits'] = checkin.metrics.rate_limits
+    if checkin.metrics.proxies:
+        report['proxies'] = checkin.metrics.proxies
+        report['proxy_traffic'] = proxy_traffic
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Offline end-to-end benchmark for LeafLowTokenCheckin')
+    parser.add_argument('--accounts', type=int, default=1000, help='Number of synthetic accounts')
+    parser.add_argument('--concurrency', type=int, default=16, help='settings.concurrency for the run')
+    parser.add_argument('--latency-ms', type=float, default=20, help='Base server latency per request')
+    parser.add_argument('--jitter-ms', type=float, default=10, help='Random extra latency per request')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of requests answered with HTTP 500')
+    parser.add_argument('--page-size', type=int, default=8192, help='Filler bytes added to every HTML page')
+    parser.add_argument('--expired-rate', type=float, default=0.05, help='Fraction of accounts with expired cookies')
+    parser.add_argument('--already-rate', type=float, default=0.2, help='Fraction of accounts already checked in')
+    parser.add_argument('--api-only-rate', type=float, default=0.1, help='Fraction of accounts that only succeed via /api/checkin')
+    parser.add_argument('--accounts-format', choices=('json', 'jsonl'), default='json',
+                        help='Store accounts in config.accounts.json or stream them from a JSONL file')
+    parser.add_argument('--server-rate-limit', type=int, default=0,
+                        help='Requests per second per host the stub accepts before answering 429 with Retry-After')
+    parser.add_argument('--rate-limit', action='store_true', help='Enable the adaptive per-host rate controller')
+    parser.add_argument('--proxies', type=int, default=0, help='Route accounts through N local stand-in proxies')
+    parser.add_argument('--proxy-latency-ms', type=float, default=0, help='Extra latency added by each stand-in proxy')
+    parser.add_argument('--proxy-failure-rate', type=float, default=0.0,
+                        help='Fraction of requests the first stand-in proxy drops')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed for latency and errors')
+    parser.add_argument('--log-level', default='WARNING', help='Log level for the check-in run')
+    parser.add_argument('--json', metavar='FILE', help='Also write the report as JSON')
+    args = parser.parse_args()
+
+    report = run_benchmark(args)
+
+    print("\n📊 LeafLow end-to-end benchmark")
+    for key, value in report.items():
+        print(f"  {key:<22} {value}")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
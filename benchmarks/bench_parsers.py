@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Micro-benchmark for the HTML detection and extraction functions
+页面识别与提取函数的微基准测试
+
+对 already_checked_in、is_checkin_page、extract_csrf_token、check_checkin_response 等函数，
+分别在真实形态的页面（仪表盘、签到页、签到结果）和构造的极端页面（数 MB 的仪表盘、
+大量 "earned" 但没有数字、超长数字串、未闭合的标签、深层嵌套表单）上计时。
+每种页面按倍数放大，输出吞吐量（MB/s）、每个函数的最坏耗时，
+并根据耗时随页面大小增长的指数标记超线性（正则回溯）的情况，便于检查解析相关改动是否变慢。
+
+用法：
+    python benchmarks/bench_parsers.py
+    python benchmarks/bench_parsers.py --scale 4 --check --json parsers.json
+"""
+
+import argparse
+import json
+import math
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from checkin_token import LeafLowTokenCheckin  # noqa: E402
+from classifier import ResponseClassifier, extract_reward  # noqa: E402
+
+
+def dashboard_row(i):
+    return (
+        f"<tr class='row'><td>{i}</td><td><a href='/servers/{i}'>server-{i}</a></td>"
+        f"<td>running</td><td>2.{i % 10} GB</td></tr>\n"
+    )
+
+
+def page(body, title='Dashboard'):
+    return (
+        "<!DOCTYPE html><html><head><meta charset='utf-8'>"
+        f"<title>{title}</title><link rel='stylesheet' href='/css/app.css'></head>"
+        "<body><nav><a href='/dashboard'>Dashboard</a> <a href='/profile'>Profile</a> "
+        f"<a href='/logout'>Logout</a></nav><main>{body}</main></body></html>"
+    )
+
+
+def realistic_dashboard(n):
+    """登录后的仪表盘，n 行服务器列表"""
+    rows = ''.join(dashboard_row(i) for i in range(n))
+    return page(f"<h1>Welcome back</h1><table>{rows}</table>")
+
+
+def realistic_checkin_page(n):
+    """带 CSRF token 的签到页"""
+    rows = ''.join(dashboard_row(i) for i in range(n))
+    return page(
+        "<meta name='csrf-token' content='bench-csrf-meta'>"
+        f"<table>{rows}</table><h2>Daily check-in</h2>"
+        "<form method='post' action='/checkin'><input type='hidden' name='_token' value='bench-csrf'>"
+        "<button type='submit'>签到</button></form>",
+        title='Check-in',
+    )
+
+
+def realistic_checkin_success(n):
+    """签到成功的响应"""
+    rows = ''.join(dashboard_row(i) for i in range(n))
+    return page(
+        f"<div class='alert'>Check-in successful! You earned 5 credits today.</div><table>{rows}</table>",
+        title='Check-in',
+    )
+
+
+def realistic_already(n):
+    """今日已签到的签到页"""
+    rows = ''.join(dashboard_row(i) for i in range(n))
+    return page(f"<table>{rows}</table><div class='alert'>You have already checked in today</div>", title='Check-in')
+
+
+def huge_dashboard(n):
+    """数 MB 的仪表盘，没有任何签到相关的指示词（每个判断都要扫描整页）"""
+    row = "<tr><td>node</td><td>running</td><td>ok</td></tr>\n"
+    return "<html><body><table>" + row * n + "</table></body></html>"
+
+
+def earned_without_number(n):
+    """同一行内大量 "earned" 但没有数字：惰性的 earned.*?(\\d+...) 对每个起点都扫描到行尾"""
+    return "<html><body><p>success " + "earned bonus points " * n + "</p></body></html>"
+
+
+def long_number(n):
+    """签到成功页面中的超长数字串（例如内嵌的数字 ID），没有 credits / points 后缀"""
+    return "<html><body><p>success</p><span data-id='" + "7" * n + "'></span></body></html>"
+
+
+def unclosed_inputs(n):
+    """大量缺少 '>' 的 _token 输入框：name=...[^>]*value= 对每个起点都扫描到文末"""
+    return "<html><body><form>" + "<input type='hidden' name='_token' " * n + "</form></body></html>"
+
+
+def unclosed_meta(n):
+    """大量缺少 '>' 的 meta 标签"""
+    return "<html><head>" + "<meta property='og:title' " * n + "</head><body>daily check-in</body></html>"
+
+
+def nested_forms(n):
+    """深层嵌套的表单和 div，CSRF token 在最内层"""
+    return (
+        "<html><body>" + "<form><div class='group'><fieldset>" * n
+        + "<input type='hidden' name='_token' value='deep-csrf'><button>签到</button>"
+        + "</fieldset></div></form>" * n + "</body></html>"
+    )
+
+
+# (名称, 类型, 生成函数, 基础规模)；规模逐级翻倍
+CORPORA = [
+    ('dashboard', 'realistic', realistic_dashboard, 200),
+    ('checkin_page', 'realistic', realistic_checkin_page, 200),
+    ('checkin_success', 'realistic', realistic_checkin_success, 200),
+    ('already_checked_in', 'realistic', realistic_already, 200),
+    ('huge_dashboard', 'adversarial', huge_dashboard, 20000),
+    ('earned_without_number', 'adversarial', earned_without_number, 500),
+    ('long_number', 'adversarial', long_number, 40),
+    ('unclosed_inputs', 'adversarial', unclosed_inputs, 500),
+    ('unclosed_meta', 'adversarial', unclosed_meta, 500),
+    ('nested_forms', 'adversarial', nested_forms, 500),
+]
+
+
+def build_targets():
+    """被测函数；LeafLowTokenCheckin 的判断方法只依赖分类器，不需要读取配置"""
+    checkin = LeafLowTokenCheckin.__new__(LeafLowTokenCheckin)
+    checkin.classifier = ResponseClassifier()
+    return {
+        'classify': checkin.classifier.classify,
+        'scan_text': lambda text: checkin.classifier.scan_text(text).labels,
+        'already_checked_in': checkin.already_checked_in,
+        'is_checkin_page': checkin.is_checkin_page,
+        'extract_csrf_token': checkin.extract_csrf_token,
+        'extract_reward': extract_reward,
+        'check_checkin_response': checkin.check_checkin_response,
+    }
+
+
+def time_call(func, text, min_time):
+    """单次调用耗时：重复调用至少 min_time 秒，取最快的一次"""
+    best = float('inf')
+    spent = 0.0
+    while spent < min_time:
+        started = time.perf_counter()
+        func(text)
+        elapsed = time.perf_counter() - started
+        best = min(best, elapsed)
+        spent += elapsed
+    return best
+
+
+def growth_exponent(points):
+    """log(耗时) 对 log(字节数) 的最小二乘斜率：约 1 为线性，约 2 为平方"""
+    if len(points) < 2:
+        return None
+    xs = [math.log(size) for size, _ in points]
+    ys = [math.log(max(elapsed, 1e-9)) for _, elapsed in points]
+    mean_x = sum(xs) / len(xs)
+    mean_y = sum(ys) / len(ys)
+    variance = sum((x - mean_x) ** 2 for x in xs)
+    if not variance:
+        return None
+    return sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys)) / variance
+
+
+def run_series(func, generate, base, args):
+    """按规模逐级放大测量一个函数；单次调用超过 --max-call-seconds 后不再放大"""
+    measurements = []
+    capped = False
+    for step in range(args.steps):
+        text = generate(int(base * args.scale) * 2 ** step)
+        elapsed = time_call(func, text, args.min_time)
+        measurements.append({
+            'bytes': len(text.encode('utf-8')),
+            'seconds': elapsed,
+            'mb_per_second': len(text.encode('utf-8')) / elapsed / 1e6 if elapsed else None,
+        })
+        if elapsed > args.max_call_seconds and step < args.steps - 1:
+            capped = True
+            break
+
+    # 耗时太短的点受计时噪声影响，不参与斜率计算
+    points = [(m['bytes'], m['seconds']) for m in measurements if m['seconds'] >= args.noise_floor_ms / 1000]
+    exponent = growth_exponent(points)
+    return {
+        'measurements': measurements,
+        'exponent': round(exponent, 2) if exponent is not None else None,
+        'superlinear': exponent is not None and exponent > args.superlinear_exponent,
+        'capped': capped,
+    }
+
+
+def run_benchmark(args):
+    targets = build_targets()
+    if args.targets:
+        targets = {name: func for name, func in targets.items() if name in args.targets}
+    corpora = [corpus for corpus in CORPORA if not args.corpora or corpus[0] in args.corpora]
+
+    report = {}
+    for name, func in targets.items():
+        series = {}
+        for corpus, kind, generate, base in corpora:
+            series[corpus] = dict(kind=kind, **run_series(func, generate, base, args))
+
+        realistic = [m for s in series.values() if s['kind'] == 'realistic' for m in s['measurements']]
+        worst_corpus = max(series, key=lambda corpus: series[corpus]['measurements'][-1]['seconds'])
+        worst = series[worst_corpus]['measurements'][-1]
+        report[name] = {
+            # 真实形态页面的总字节数 / 总耗时
+            'realistic_mb_per_second': round(
+                sum(m['bytes'] for m in realistic) / sum(m['seconds'] for m in realistic) / 1e6, 1
+            ) if realistic else None,
+            'worst_case_ms': round(worst['seconds'] * 1000, 3),
+            'worst_case_corpus': worst_corpus,
+            'worst_case_bytes': worst['bytes'],
+            'superlinear': sorted(corpus for corpus, s in series.items() if s['superlinear']),
+            'corpora': series,
+        }
+    return report
+
+
+def print_report(report):
+    print("\n📊 LeafLow parser benchmark")
+    for name, result in report.items():
+        print(f"\n{name}")
+        print(f"  {'corpus':<24} {'bytes':>10} {'ms':>11} {'MB/s':>9} {'exp':>6}")
+        for corpus, series in result['corpora'].items():
+            last = series['measurements'][-1]
+            flag = ''
+            if series['superlinear']:
+                flag = '  ⚠️ superlinear'
+            if series['capped']:
+                flag += ' (capped)'
+            exponent = f"{series['exponent']:.2f}" if series['exponent'] is not None else '-'
+            mb_per_second = f"{last['mb_per_second']:.1f}" if last['mb_per_second'] else '-'
+            print(f"  {corpus:<24} {last['bytes']:>10} {last['seconds'] * 1000:>11.3f} {mb_per_second:>9} {exponent:>6}{flag}")
+
+    print("\n🏁 Summary")
+    print(f"  {'function':<24} {'realistic MB/s':>15} {'worst ms':>11}  worst corpus / superlinear")
+    for name, result in report.items():
+        throughput = result['realistic_mb_per_second']
+        flags = f"  ⚠️ {', '.join(result['superlinear'])}" if result['superlinear'] else ''
+        print(
+            f"  {name:<24} {throughput if throughput is not None else '-':>15} "
+            f"{result['worst_case_ms']:>11.3f}  {result['worst_case_corpus']}{flags}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Micro-benchmark for the HTML detection and extraction functions')
+    parser.add_argument('--scale', type=float, default=1.0, help='Multiply the base size of every corpus')
+    parser.add_argument('--steps', type=int, default=4, help='Number of sizes per corpus, each twice the previous')
+    parser.add_argument('--min-time', type=float, default=0.05, help='Minimum seconds spent timing each size')
+    parser.add_argument('--max-call-seconds', type=float, default=1.0,
+                        help='Stop growing a corpus once one call takes longer than this')
+    # 回溯导致的平方 / 立方增长拟合出的指数约为 2 / 3；线性函数在页面超出 CPU 缓存后也可能到 1.5 左右
+    parser.add_argument('--superlinear-exponent', type=float, default=1.7,
+                        help='Flag a function/corpus pair whose time grows faster than size**EXP')
+    parser.add_argument('--noise-floor-ms', type=float, default=0.5,
+                        help='Ignore sizes faster than this when fitting the growth exponent')
+    parser.add_argument('--targets', nargs='+', metavar='FUNC', help='Only benchmark these functions')
+    parser.add_argument('--corpora', nargs='+', metavar='CORPUS', help='Only use these corpora')
+    parser.add_argument('--check', action='store_true', help='Exit with status 1 if any superlinear behavior is flagged')
+    parser.add_argument('--json', metavar='FILE', help='Also write the report as JSON')
+    args = parser.parse_args()
+
+    report = run_benchmark(args)
+    print_report(report)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+
+    if args.check and any(result['superlinear'] for result in report.values()):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+LeafLow stand-in server for offline benchmarks
+本地模拟的 leaflow.net / checkin.leaflow.net
+
+模拟签到脚本用到的路由：/dashboard、/profile、/user、签到页面、/api/checkin、/checkin、
+登录重定向以及"今日已签到"页面。延迟、错误率、页面大小均可配置。
+账号通过 Cookie 中的 leaflow_session 区分。
+"""
+
+import hashlib
+import random
+import sys
+import threading
+import time
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+
+class StubServer(ThreadingHTTPServer):
+    """客户端提前断开连接（例如读够页面后关闭流式响应）时不打印异常"""
+
+    daemon_threads = True
+    # 监听队列需要容纳大量并发连接
+    request_queue_size = 1024
+
+    def handle_error(self, request, client_address):
+        if isinstance(sys.exc_info()[1], (ConnectionResetError, BrokenPipeError)):
+            return
+        super().handle_error(request, client_address)
+
+
+class StubSettings:
+    """模拟站点的行为参数"""
+
+    def __init__(self, latency_ms=20, jitter_ms=10, error_rate=0.0, page_size=8192,
+                 expired_rate=0.0, already_rate=0.0, api_only_rate=0.0, rate_limit=0, cookie_ttl=0, seed=0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.page_size = page_size
+        # 按比例划分的账号类型：Cookie 失效、今日已签到、只能通过 API 签到
+        self.expired_rate = expired_rate
+        self.already_rate = already_rate
+        self.api_only_rate = api_only_rate
+        # 每个主机每秒最多处理的请求数，超出时返回 429 和 Retry-After（0 为不限制）
+        self.rate_limit = rate_limit
+        # 大于 0 时登录后的页面通过 Set-Cookie 续期 leaflow_session，有效期为 cookie_ttl 秒
+        self.cookie_ttl = cookie_ttl
+        self.random = random.Random(seed)
+        self.random_lock = threading.Lock()
+
+    def uniform(self):
+        with self.random_lock:
+            return self.random.random()
+
+
+class StubState:
+    """模拟站点的共享状态与统计"""
+
+    def __init__(self, settings):
+        self.settings = settings
+        self.lock = threading.Lock()
+        self.checked_in = set()
+        self.requests = 0
+        self.errors = 0
+        self.bytes_sent = 0
+        self.throttled = 0
+        self.windows = {}
+
+    def over_rate_limit(self, role):
+        """按主机统计每秒请求数（固定窗口），超出 settings.rate_limit 时返回 True"""
+        if not self.settings.rate_limit:
+            return False
+        second = int(time.monotonic())
+        with self.lock:
+            window, count = self.windows.get(role, (second, 0))
+            if window != second:
+                window, count = second, 0
+            self.windows[role] = (window, count + 1)
+            if count < self.settings.rate_limit:
+                return False
+            self.throttled += 1
+            return True
+
+    def account_kind(self, session_id):
+        """根据会话 ID 稳定地决定账号类型"""
+        if not session_id:
+            return 'expired'
+        bucket = int(hashlib.sha1(session_id.encode('utf-8')).hexdigest()[:8], 16) / 0xFFFFFFFF
+        settings = self.settings
+        if bucket < settings.expired_rate:
+            return 'expired'
+        bucket -= settings.expired_rate
+        if bucket < settings.already_rate:
+            return 'already'
+        bucket -= settings.already_rate
+        if bucket < settings.api_only_rate:
+            return 'api_only'
+        return 'normal'
+
+    def is_checked_in(self, session_id):
+        with self.lock:
+            return session_id in self.checked_in or self.account_kind(session_id) == 'already'
+
+    def check_in(self, session_id):
+        """记录签到，返回是否为今日首次签到"""
+        with self.lock:
+            if session_id in self.checked_in:
+                return False
+            self.checked_in.add(session_id)
+            return True
+
+    def record(self, status, size):
+        with self.lock:
+            self.requests += 1
+            self.bytes_sent += size
+            if status >= 500:
+                self.errors += 1
+
+    def snapshot(self):
+        with self.lock:
+            return {'requests': self.requests, 'errors': self.errors, 'bytes_sent': self.bytes_sent,
+                    'throttled': self.throttled}
+
+
+def make_handler(state, role):
+    """role 为 'main'（leaflow.net）或 'checkin'（checkin.leaflow.net）"""
+
+    class StubHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, format, *args):
+            pass
+
+        def session_id(self):
+            for part in self.headers.get('Cookie', '').split(';'):
+                name, _, value = part.strip().partition('=')
+                if name == 'leaflow_session':
+                    return value
+            return ''
+
+        def padding(self):
+            return '<div class="filler">' + 'x' * max(0, state.settings.page_size) + '</div>'
+
+        def respond(self, status, body='', headers=None):
+            payload = body.encode('utf-8')
+            self.send_response(status)
+            # headers 可以是字典，也可以是 (名称, 值) 列表（多个 Set-Cookie）
+            for name, value in (headers.items() if isinstance(headers, dict) else headers or ()):
+                self.send_header(name, value)
+            self.send_header('Content-Type', 'text/html; charset=utf-8')
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            if self.command != 'HEAD':
+                self.wfile.write(payload)
+            state.record(status, len(payload))
+
+        def delay(self):
+            settings = state.settings
+            latency = settings.latency_ms + settings.jitter_ms * settings.uniform()
+            if latency > 0:
+                time.sleep(latency / 1000.0)
+
+        def handle_request(self):
+            length = int(self.headers.get('Content-Length') or 0)
+            if length:
+                self.rfile.read(length)
+
+            if state.over_rate_limit(role):
+                self.respond(429, '<html><body>Too Many Requests</body></html>', {'Retry-After': '1'})
+                return
+
+            self.delay()
+            if state.settings.error_rate and state.settings.uniform() < state.settings.error_rate:
+                self.respond(500, '<html><body>Internal Server Error</body></html>')
+                return
+
+            path = urlsplit(self.path).path.rstrip('/') or '/'
+            session_id = self.session_id()
+            kind = state.account_kind(session_id)
+
+            if path == '/login':
+                self.respond(200, '<html><body><form>user login</form></body></html>')
+                return
+            if kind == 'expired':
+                self.respond(302, '', {'Location': '/login'})
+                return
+
+            rotate = [('Set-Cookie', f"XSRF-TOKEN={hashlib.sha1(str(time.time()).encode()).hexdigest()}; Path=/")]
+            if state.settings.cookie_ttl:
+                expires = formatdate(time.time() + state.settings.cookie_ttl, usegmt=True)
+                rotate.append(('Set-Cookie', f"leaflow_session={session_id}; Path=/; Expires={expires}; HttpOnly"))
+
+            if role == 'main' and path in ('/dashboard', '/profile', '/user'):
+                self.respond(200, f"<html><body><h1>Dashboard</h1><a href='/logout'>logout</a>{self.padding()}</body></html>", rotate)
+            elif role == 'checkin' and path == '/':
+                self.checkin_page(session_id, kind, rotate)
+            elif path in ('/api/checkin', '/checkin'):
+                self.api_checkin(session_id, kind)
+            else:
+                self.respond(404, '<html><body>Not Found</body></html>')
+
+        def checkin_page(self, session_id, kind, headers):
+            if self.command == 'POST':
+                if kind == 'api_only':
+                    self.respond(419, '<html><body>Page Expired</body></html>')
+                elif state.check_in(session_id):
+                    self.respond(200, '<html><body>签到成功！获得奖励 0.5 元</body></html>')
+                else:
+                    self.respond(200, '<html><body>今日已签到</body></html>')
+                return
+
+            if state.is_checked_in(session_id):
+                status = '<p>今日已签到 Already checked in today</p>'
+            elif kind == 'api_only':
+                status = '<p>Welcome back</p>'
+            else:
+                status = ("<form method='post'><input type='hidden' name='_token' value='stub-csrf'>"
+                          "<button>每日签到 Daily check-in</button></form>")
+            self.respond(200, f"<html><body><a href='/logout'>logout</a>{self.padding()}{status}</body></html>", headers)
+
+        def api_checkin(self, session_id, kind):
+            if role != 'checkin' or kind != 'api_only':
+                self.respond(404, '<html><body>Not Found</body></html>')
+            elif self.command == 'GET':
+                self.respond(405, '{"message": "Method Not Allowed"}')
+            elif state.check_in(session_id):
+                self.respond(200, '{"success": true, "message": "Earned 1 credits"}')
+            else:
+                self.respond(200, '{"success": true, "message": "Already checked in today"}')
+
+        do_GET = handle_request
+        do_POST = handle_request
+        do_HEAD = handle_request
+
+    return StubHandler
+
+
+class LeafLowStub:
+    """在本地端口启动 leaflow.net 与 checkin.leaflow.net 两个模拟站点"""
+
+    def __init__(self, settings=None, host='127.0.0.1'):
+        self.settings = settings or StubSettings()
+        self.state = StubState(self.settings)
+        self.servers = {
+            role: StubServer((host, 0), make_handler(self.state, role))
+            for role in ('main', 'checkin')
+        }
+
+    def url(self, role):
+        host, port = self.servers[role].server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def main_site(self):
+        return self.url('main')
+
+    @property
+    def checkin_url(self):
+        return self.url('checkin')
+
+    def start(self):
+        for server in self.servers.values():
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        for server in self.servers.values():
+            server.shutdown()
+            server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Run a local LeafLow stand-in server')
+    parser.add_argument('--latency-ms', type=float, default=20)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--page-size', type=int, default=8192)
+    args = parser.parse_args()
+
+    stub = LeafLowStub(StubSettings(latency_ms=args.latency_ms, error_rate=args.error_rate,
+                                    page_size=args.page_size)).start()
+    print(f"main_site:   {stub.main_site}")
+    print(f"checkin_url: {stub.checkin_url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        stub.stop()
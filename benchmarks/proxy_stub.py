@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Local stand-in HTTP proxies for offline benchmarks
+本地模拟的出口代理
+
+转发绝对 URI 形式的 HTTP 请求（到本地模拟站点），可配置附加延迟和故障率：
+故障时直接断开连接，客户端看到的是代理连接错误。用于测试代理池的粘性分配和健康度评分。
+"""
+
+import http.client
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler
+from urllib.parse import urlsplit
+
+from leaflow_stub import StubServer
+
+# 不转发的逐跳头
+HOP_BY_HOP_HEADERS = {
+    'connection', 'keep-alive', 'proxy-authenticate', 'proxy-authorization', 'proxy-connection',
+    'te', 'trailers', 'transfer-encoding', 'upgrade',
+}
+
+
+class ProxyStats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.failures = 0
+
+    def record(self, failed):
+        with self.lock:
+            self.requests += 1
+            if failed:
+                self.failures += 1
+
+    def snapshot(self):
+        with self.lock:
+            return {'requests': self.requests, 'failures': self.failures}
+
+
+def make_handler(proxy):
+    class ProxyHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, format, *args):
+            pass
+
+        def forward(self):
+            length = int(self.headers.get('Content-Length') or 0)
+            body = self.rfile.read(length) if length else None
+
+            if proxy.should_fail():
+                proxy.stats.record(True)
+                # 不返回任何响应直接断开
+                self.close_connection = True
+                return
+
+            if proxy.latency_ms > 0:
+                time.sleep(proxy.latency_ms / 1000.0)
+
+            target = urlsplit(self.path)
+            path = target.path or '/'
+            if target.query:
+                path = f"{path}?{target.query}"
+            headers = {
+                name: value for name, value in self.headers.items()
+                if name.lower() not in HOP_BY_HOP_HEADERS
+            }
+
+            connection = http.client.HTTPConnection(target.hostname, target.port or 80, timeout=30)
+            try:
+                connection.request(self.command, path, body=body, headers=headers)
+                upstream = connection.getresponse()
+                payload = upstream.read()
+                self.send_response(upstream.status, upstream.reason)
+                for name, value in upstream.getheaders():
+                    if name.lower() not in HOP_BY_HOP_HEADERS and name.lower() != 'content-length':
+                        self.send_header(name, value)
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                if self.command != 'HEAD':
+                    self.wfile.write(payload)
+            finally:
+                connection.close()
+            proxy.stats.record(False)
+
+        do_GET = do_POST = do_HEAD = forward
+
+    return ProxyHandler
+
+
+class StubProxy:
+    """单个转发代理，failure_rate 为直接断开连接的请求比例"""
+
+    def __init__(self, latency_ms=0, failure_rate=0.0, seed=0, host='127.0.0.1'):
+        self.latency_ms = latency_ms
+        self.failure_rate = failure_rate
+        self.random = random.Random(seed)
+        self.random_lock = threading.Lock()
+        self.stats = ProxyStats()
+        self.server = StubServer((host, 0), make_handler(self))
+
+    def should_fail(self):
+        if not self.failure_rate:
+            return False
+        with self.random_lock:
+            return self.random.random() < self.failure_rate
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+LeafLow HTTP cassettes
+HTTP 录制与回放
+
+录制模式：真实运行时记录每个请求和响应（含耗时），Cookie、Authorization 和 CSRF token 脱敏后写入 cassette 文件。
+回放模式：不访问网络，按 (账号, 方法, URL) 依次返回录制的响应，可按原始耗时或按比例缩放的耗时等待，
+用于离线复现 perform_checkin / test_authentication 的回退流程，以及在真实流量形态下做性能分析。
+"""
+
+import base64
+import io
+import json
+import re
+import threading
+import time
+from datetime import datetime
+from urllib.parse import parse_qsl, urlencode
+
+import requests
+from urllib3.response import HTTPResponse
+
+from classifier import CSRF_PATTERNS
+from log_pipeline import current_account
+from state_store import atomic_write_json
+from transport import PooledTransport
+
+CASSETTE_VERSION = 1
+REDACTED = 'REDACTED'
+SENSITIVE_HEADERS = {'cookie', 'set-cookie', 'authorization', 'x-csrf-token', 'x-xsrf-token'}
+SENSITIVE_FIELDS = {'_token', 'csrf_token', 'password', 'email'}
+# 回放时由 requests 重新计算的响应头
+DROPPED_RESPONSE_HEADERS = {'content-encoding', 'content-length', 'transfer-encoding'}
+
+
+def redact_headers(headers):
+    """Cookie 只保留名称，其余敏感头整体替换"""
+    redacted = {}
+    for name, value in headers.items():
+        lowered = name.lower()
+        if lowered in ('cookie', 'set-cookie'):
+            redacted[name] = _redact_cookie_header(value, lowered == 'set-cookie')
+        elif lowered in SENSITIVE_HEADERS:
+            redacted[name] = REDACTED
+        else:
+            redacted[name] = value
+    return redacted
+
+
+def _redact_cookie_header(value, set_cookie):
+    if set_cookie:
+        # 多个 Set-Cookie 被合并为逗号分隔；只替换每个 Cookie 的值，保留属性
+        return re.sub(r'(^|,\s*)([^=;,\s]+)=[^;,]*', lambda m: f"{m.group(1)}{m.group(2)}={REDACTED}", value)
+    return '; '.join(
+        f"{part.split('=', 1)[0].strip()}={REDACTED}" for part in value.split(';') if part.strip()
+    )
+
+
+def redact_body(body):
+    """表单中的 token / 密码等字段脱敏"""
+    if not body:
+        return ''
+    if isinstance(body, bytes):
+        body = body.decode('utf-8', 'replace')
+    fields = parse_qsl(body, keep_blank_values=True)
+    if not fields:
+        return body
+    return urlencode([(name, REDACTED if name in SENSITIVE_FIELDS else value) for name, value in fields])
+
+
+def redact_content(text):
+    """页面中的 CSRF token 脱敏"""
+    for pattern in CSRF_PATTERNS:
+        text = pattern.sub(lambda m: m.group(0).replace(m.group(1), REDACTED), text)
+    return text
+
+
+def encode_content(content):
+    """正文按 UTF-8 文本保存（脱敏后），无法解码时按 base64 保存"""
+    try:
+        return {'text': redact_content(content.decode('utf-8'))}
+    except UnicodeDecodeError:
+        return {'base64': base64.b64encode(content).decode('ascii')}
+
+
+def decode_content(body):
+    if 'base64' in body:
+        return base64.b64decode(body['base64'])
+    return body.get('text', '').encode('utf-8')
+
+
+class RecordingTransport(PooledTransport):
+    """正常发送请求，同时记录每个请求/响应"""
+
+    def __init__(self, path, **kwargs):
+        super().__init__(**kwargs)
+        self.path = path
+        self.interactions = []
+        self.interactions_lock = threading.Lock()
+
+    def send(self, request, **kwargs):
+        started = time.perf_counter()
+        response = super().send(request, **kwargs)
+        # 录制需要完整正文；之后 iter_content 会直接使用已读取的内容
+        content = response.content
+        elapsed = time.perf_counter() - started
+
+        interaction = {
+            'account': current_account(),
+            'request': {
+                'method': request.method,
+                'url': request.url,
+                'headers': redact_headers(request.headers),
+                'body': redact_body(request.body),
+            },
+            'response': dict(
+                status=response.status_code,
+                reason=response.reason,
+                headers=redact_headers(response.headers),
+                **encode_content(content),
+            ),
+            'elapsed': round(elapsed, 6),
+        }
+        with self.interactions_lock:
+            self.interactions.append(interaction)
+        return response
+
+    def save(self):
+        """写出 cassette 文件"""
+        with self.interactions_lock:
+            interactions = list(self.interactions)
+        atomic_write_json(self.path, {
+            'version': CASSETTE_VERSION,
+            'recorded_at': datetime.now().isoformat(),
+            'interactions': interactions,
+        })
+        return len(interactions)
+
+
+class CassetteMiss(requests.ConnectionError):
+    """cassette 中没有与请求匹配的记录"""
+
+
+class ReplayTransport(PooledTransport):
+    """不访问网络，按 (账号, 方法, URL) 轮流返回 cassette 中录制的响应；账号不匹配时按 (方法, URL) 返回"""
+
+    def __init__(self, path, latency_scale=1.0, **kwargs):
+        super().__init__(**kwargs)
+        self.path = path
+        self.latency_scale = latency_scale
+        self.replay_lock = threading.Lock()
+        self.recorded = {}
+        self.positions = {}
+
+        with open(path, 'r', encoding='utf-8') as f:
+            cassette = json.load(f)
+        for interaction in cassette.get('interactions', []):
+            key = (interaction['request']['method'], interaction['request']['url'])
+            # 并发录制时各账号的请求交错，按账号分组才能还原每个账号自己的响应序列
+            self.recorded.setdefault((interaction.get('account'),) + key, []).append(interaction)
+            self.recorded.setdefault((None,) + key, []).append(interaction)
+
+    def next_interaction(self, request):
+        account = current_account()
+        with self.replay_lock:
+            key = (account, request.method, request.url)
+            interactions = self.recorded.get(key)
+            if not interactions:
+                key = (None, request.method, request.url)
+                interactions = self.recorded.get(key)
+            if not interactions:
+                return None
+            # 录制的次数少于回放的账号数时循环使用
+            position = self.positions.get(key, 0)
+            self.positions[key] = position + 1
+        return interactions[position % len(interactions)]
+
+    def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+        self.count('requests_sent')
+        interaction = self.next_interaction(request)
+        if interaction is None:
+            raise CassetteMiss(f"No recorded interaction for {request.method} {request.url}", request=request)
+
+        delay = interaction.get('elapsed', 0) * self.latency_scale
+        if delay > 0:
+            time.sleep(delay)
+
+        recorded = interaction['response']
+        content = decode_content(recorded)
+        headers = {
+            name: value for name, value in recorded.get('headers', {}).items()
+            if name.lower() not in DROPPED_RESPONSE_HEADERS
+        }
+        headers['Content-Length'] = str(len(content))
+        raw = HTTPResponse(
+            body=io.BytesIO(content), headers=headers, status=recorded['status'],
+            reason=recorded.get('reason'), preload_content=False, decode_content=False,
+        )
+        return self.build_response(request, raw)
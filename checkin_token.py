@@ -18,23 +18,103 @@ import time
 import sys
 import logging
 import argparse
+import asyncio
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
 import requests
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from transport import ACCEPT_ENCODING, AccountSession, DeadlineExceeded, PooledTransport
+from state_store import EndpointCache, JsonStateFile, SessionStateStore, TokenStatusStore, atomic_open, cookies_fingerprint, format_timestamp, session_cookie_expiry
+from classifier import ResponseClassifier, extract_csrf_token, extract_reward, read_limited_text
+from metrics import RunMetrics
+from scheduler import CheckinDaemon
+from account_source import JsonlAccountSource, session_identity
+from journal import RunJournal
+from circuit_breaker import CircuitBreakerRegistry
+from log_pipeline import account_logging, bind_session, configure_logging
+from cassette import RecordingTransport, ReplayTransport
+from rate_limiter import RateController
+from proxy_pool import ProxyPool, proxy_label
+from result_sink import open_result_sink
+from notify_digest import build_digest
 
 class LeafLowTokenCheckin:
-    def __init__(self, config_file="config.accounts.json"):
-        """初始化Token签到类"""
+    def __init__(self, config_file="config.accounts.json", settings_overrides=None):
+        """初始化Token签到类；settings_overrides（命令行参数）覆盖配置文件中的 settings，重新加载配置后同样生效"""
         self.config_file = config_file
+        self.settings_overrides = dict(settings_overrides or {})
+        self.replay_state_dir = None
         self.config = self.load_config()
         self.setup_logging()
-        self.checkin_url = "https://checkin.leaflow.net"
-        self.main_site = "https://leaflow.net"
+        self.apply_site_settings()
+        self.transport = None
+        self.transport_lock = threading.Lock()
+        self.rate_controller = None
+        self.shard = None
+        self.run_deadline = None
+        self.classifier = ResponseClassifier()
+        self.metrics = RunMetrics()
+        self.force_rerun = False
+        self.journal = None
+        self.init_state()
+        
+    def init_state(self):
+        """打开 settings.state_dir 下的本地状态；回放 cassette 时改用临时目录（shutdown() 时删除），不影响真实状态"""
+        settings = self.config['settings']
+        if settings.get('replay_cassette'):
+            if self.replay_state_dir is None:
+                self.replay_state_dir = tempfile.mkdtemp(prefix='leaflow-replay-')
+            settings['state_dir'] = self.replay_state_dir
+        
+        self.endpoint_cache = EndpointCache(
+            self.state_path('endpoint_cache.json'),
+            ttl=self.config['settings'].get('endpoint_cache_ttl', 7 * 24 * 3600),
+        )
+        self.session_store = None
+        if self.config['settings'].get('persist_cookies', True):
+            self.session_store = SessionStateStore(self.state_path('sessions.json'))
+        self.token_status = None
+        if self.config['settings'].get('token_status', True):
+            self.token_status = TokenStatusStore(self.state_path('token_status.json'))
+        if self.journal is not None:
+            self.journal.close()
+        self.journal = None
+        if self.config['settings'].get('journal', True):
+            self.journal = RunJournal(
+                self.state_path('journal.sqlite3'),
+                retention_days=self.config['settings'].get('journal_retention_days', 30),
+            )
+        self.breaker_state = None
+        if self.config['settings'].get('persist_circuit_breakers', False):
+            self.breaker_state = JsonStateFile(self.state_path('circuit_breakers.json'))
+        self.circuit_breakers = CircuitBreakerRegistry(
+            failure_threshold=self.config['settings'].get('breaker_failure_threshold', 3),
+            cooldown=self.config['settings'].get('breaker_cooldown', 300),
+            logger=self.logger,
+            state=self.breaker_state,
+        )
+        self.proxy_state = None
+        self.proxy_pool = None
+        if self.config['settings'].get('proxies'):
+            self.proxy_state = JsonStateFile(self.state_path('proxy_assignments.json'))
+            self.proxy_pool = ProxyPool(
+                self.config['settings']['proxies'],
+                state=self.proxy_state,
+                min_health=float(self.config['settings'].get('proxy_min_health', 0.5)),
+                logger=self.logger,
+            )
         
     def load_config(self):
         """加载配置文件"""
         try:
             with open(self.config_file, 'r', encoding='utf-8') as f:
-                return json.load(f)
+                config = json.load(f)
+            config.setdefault('settings', {}).update(self.settings_overrides)
+            return config
         except FileNotFoundError:
             print(f"Configuration file {self.config_file} not found")
             sys.exit(1)
@@ -42,36 +122,161 @@ class LeafLowTokenCheckin:
             print(f"Configuration file {self.config_file} format error")
             sys.exit(1)
     
+    def apply_site_settings(self):
+        """读取站点地址（可在 settings 中覆盖，用于测试或镜像站）"""
+        self.checkin_url = self.config['settings'].get('checkin_url', "https://checkin.leaflow.net").rstrip('/')
+        self.main_site = self.config['settings'].get('main_site', "https://leaflow.net").rstrip('/')
+    
+    def reload_config(self):
+        """重新加载配置文件，失败时保留当前配置"""
+        try:
+            config = self.load_config()
+        except SystemExit:
+            self.logger.error("❌ Failed to reload %s, keeping current configuration", self.config_file)
+            return False
+        
+        self.config = config
+        self.apply_site_settings()
+        # 先写回当前状态，再按新配置重建状态文件、代理池、断路器、限速和连接池（重建时从磁盘重新读取）
+        self.save_state()
+        self.init_state()
+        self.setup_logging()
+        with self.transport_lock:
+            self.rate_controller = None
+            if self.transport is not None:
+                self.transport.shutdown()
+                self.transport = None
+        return True
+    
+    def state_path(self, filename):
+        """本地状态文件路径（位于 settings.state_dir 目录下）"""
+        return os.path.join(self.config['settings'].get('state_dir', '.leaflow_state'), filename)
+    
+    def get_account_key(self, account, account_name):
+        """账号的稳定标识：优先 id/email，其次 remember_web_* cookie 摘要（没有时为 leaflow_session），最后退回账号名称"""
+        for field in ('id', 'email'):
+            if account.get(field):
+                return str(account[field])
+        
+        identity = session_identity(account.get('token_data', {}).get('cookies', {}))
+        if identity:
+            return identity
+        
+        return account_name
+    
     def setup_logging(self):
-        """设置日志"""
-        log_level = getattr(logging, self.config['settings'].get('log_level', 'INFO').upper())
-        logging.basicConfig(
-            level=log_level,
-            format='%(asctime)s - %(levelname)s - %(message)s',
-            handlers=[
-                logging.FileHandler('leaflow_token_checkin.log', encoding='utf-8'),
-                logging.StreamHandler()
-            ]
-        )
+        """设置日志（队列 + 后台写入线程，日志文件自动轮转）"""
+        configure_logging(self.config['settings'])
         self.logger = logging.getLogger(__name__)
     
-    def create_session(self, token_data):
+    def get_transport(self):
+        """获取所有账号共享的连接池（首次使用时创建）"""
+        with self.transport_lock:
+            if self.transport is None:
+                settings = self.config['settings']
+                pool_maxsize = int(settings.get('pool_maxsize', max(10, self.get_concurrency())))
+                if settings.get('replay_cassette'):
+                    self.transport = ReplayTransport(
+                        settings['replay_cassette'], pool_maxsize=pool_maxsize,
+                        latency_scale=float(settings.get('replay_latency_scale', 1.0)),
+                    )
+                elif settings.get('record_cassette'):
+                    self.transport = RecordingTransport(settings['record_cassette'], pool_maxsize=pool_maxsize)
+                else:
+                    self.transport = PooledTransport(pool_maxsize=pool_maxsize)
+            return self.transport
+    
+    def get_rate_controller(self):
+        """获取所有账号共享的按主机自适应限速（settings.rate_limit 为 false 或回放 cassette 时返回 None）"""
+        settings = self.config['settings']
+        # 回放时的耗时只反映录制的响应耗时，不受限速等待影响
+        if not settings.get('rate_limit', True) or settings.get('replay_cassette'):
+            return None
+        with self.transport_lock:
+            if self.rate_controller is None:
+                self.rate_controller = RateController(
+                    initial_rate=float(settings.get('rate_initial', 2.0)),
+                    min_rate=float(settings.get('rate_min', 0.2)),
+                    max_rate=float(settings.get('rate_max', 20.0)),
+                    burst=float(settings.get('rate_burst', 5)),
+                    increase=float(settings.get('rate_increase', 0.5)),
+                    decrease=float(settings.get('rate_decrease', 0.5)),
+                    max_retry_after=float(settings.get('max_retry_after', 300)),
+                    logger=self.logger,
+                )
+            return self.rate_controller
+    
+    def get_request_timeout(self):
+        """请求超时 (连接超时, 读取超时)，取自 settings.connect_timeout / settings.timeout"""
+        settings = self.config['settings']
+        read_timeout = float(settings.get('timeout', 30))
+        connect_timeout = float(settings.get('connect_timeout', min(10, read_timeout)))
+        return connect_timeout, read_timeout
+    
+    def apply_deadline(self, session):
+        """设置账号的截止时间：账号预算 settings.account_deadline 与整次运行预算中较早的一个"""
+        budget = float(self.config['settings'].get('account_deadline', 180))
+        deadline, message = None, None
+        if budget > 0:
+            deadline = time.monotonic() + budget
+            message = f"Account time budget of {budget:g}s exceeded"
+        if self.run_deadline is not None and (deadline is None or self.run_deadline < deadline):
+            deadline, message = self.run_deadline, "Run time budget exceeded"
+        session.set_deadline(deadline, message)
+    
+    def select_proxy(self, account, account_key, account_name=None):
+        """账号使用的出口代理：账号配置中的 proxy 优先，其次从 settings.proxies 代理池粘性分配，都没有时直连"""
+        if account.get('proxy'):
+            return account['proxy']
+        if self.proxy_pool is not None:
+            return self.proxy_pool.assign(account_key, account_name)
+        return None
+    
+    def endpoint_route(self, session, url):
+        """熔断器的键：经代理访问时按 端点 + 代理 区分，单个代理故障不会熔断其他账号使用的端点"""
+        proxy = getattr(session, 'proxy', None)
+        return f"{url} via {proxy_label(proxy)}" if proxy else url
+    
+    def create_session(self, token_data, account_key=None, proxy=None):
         """根据token数据创建会话"""
-        session = requests.Session()
+        session = AccountSession(account_key, timeout=self.get_request_timeout())
+        session.rate_controller = self.get_rate_controller()
+        session.throttle_retries = int(self.config['settings'].get('throttle_retries', 2))
+        if proxy:
+            session.proxy = proxy
+            session.proxies = {'http': proxy, 'https': proxy}
+        
+        # 挂载共享连接池，Cookie和Header仍然按账号隔离
+        transport = self.get_transport()
+        session.mount('https://', transport)
+        session.mount('http://', transport)
         
         # 设置基本headers
         session.headers.update({
             'User-Agent': self.config['settings']['user_agent'],
             'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
             'Accept-Language': 'zh-CN,zh;q=0.9,en;q=0.8',
-            'Accept-Encoding': 'gzip, deflate, br',
+            'Accept-Encoding': ACCEPT_ENCODING,
             'DNT': '1',
             'Connection': 'keep-alive',
             'Upgrade-Insecure-Requests': '1',
         })
         
         # 添加认证信息
-        if 'cookies' in token_data:
+        stored_cookies = None
+        if self.session_store is not None and account_key:
+            stored_cookies = self.session_store.load_cookies(
+                account_key, cookies_fingerprint(token_data.get('cookies'))
+            )
+        
+        if stored_cookies:
+            # 使用上次运行结束时服务器轮换后的cookies
+            for cookie in stored_cookies:
+                session.cookies.set(
+                    cookie['name'], cookie['value'], domain=cookie['domain'],
+                    path=cookie['path'], expires=cookie['expires'], secure=cookie['secure'],
+                )
+        elif 'cookies' in token_data:
             # 设置cookies
             for name, value in token_data['cookies'].items():
                 session.cookies.set(name, value)
@@ -82,91 +287,206 @@ class LeafLowTokenCheckin:
         
         return session
     
+    def get_max_response_bytes(self):
+        """每个响应最多下载的字节数（settings.max_response_bytes，0 为不限制）"""
+        return int(self.config['settings'].get('max_response_bytes', 1024 * 1024)) or None
+    
+    def read_response_text(self, response):
+        """读取 stream=True 响应的正文，超出字节上限的部分不下载"""
+        return read_limited_text(response, self.get_max_response_bytes())
+    
+    def fetch_page(self, session, url):
+        """流式GET页面，正文按需读取；本次运行内同一会话对同一URL只请求一次"""
+        cached = session.page_cache.get(url)
+        if cached is not None:
+            self.logger.debug("Reusing fetched page %s", url)
+            return cached
+        
+        response = session.get(url, stream=True)
+        page = self.classifier.scan_response(response, max_bytes=self.get_max_response_bytes())
+        if response.status_code == 200:
+            session.page_cache[url] = page
+        else:
+            # 非200响应不需要正文
+            page.close()
+        return page
+    
     def test_authentication(self, session, account_name):
         """测试认证是否有效"""
         try:
             # 尝试访问需要认证的页面
+            # 签到页面放在最前：认证成功时其响应可直接被 perform_checkin 复用
             test_urls = [
+                self.checkin_url,
                 f"{self.main_site}/dashboard",
                 f"{self.main_site}/profile",
                 f"{self.main_site}/user",
-                self.checkin_url,
             ]
             
+            session.phase = 'auth_probe'
+            probe_error = None
             for url in test_urls:
-                response = session.get(url, timeout=30)
-                self.logger.debug(f"[{account_name}] Test {url}: {response.status_code}")
+                # 熔断中或连接失败的页面换下一个页面验证
+                route = self.endpoint_route(session, url)
+                if not self.circuit_breakers.allow(route):
+                    continue
+                try:
+                    page = self.fetch_page(session, url)
+                    response = page.response
+                    self.circuit_breakers.record(route, response.status_code < 500)
+                except requests.RequestException as e:
+                    self.circuit_breakers.record(route, False)
+                    probe_error = e
+                    continue
+                finally:
+                    # 超出时间预算等异常退出时不会 record，释放探测名额
+                    self.circuit_breakers.release(route)
+                self.logger.debug("[%s] Test %s: %s", account_name, url, response.status_code)
+                
+                if response.status_code == 200 and 'login' in response.url.lower():
+                    # 已被重定向到登录页
+                    session.login_redirected = True
+                    continue
                 
                 if response.status_code == 200:
-                    content = response.text.lower()
-                    if any(indicator in content for indicator in ['dashboard', 'profile', 'user', 'logout', 'welcome']):
-                        self.logger.info(f"✅ [{account_name}] Authentication valid")
+                    # 找到登录后才有的内容即可停止读取
+                    page.read_until(lambda scan: 'auth' in scan.labels)
+                    if 'auth' in page.labels:
+                        self.logger.info("✅ [%s] Authentication valid", account_name)
                         return True, "Authentication successful"
                 elif response.status_code in [301, 302, 303]:
                     location = response.headers.get('location', '')
                     if 'login' not in location.lower():
-                        self.logger.info(f"✅ [{account_name}] Authentication valid (redirect)")
+                        self.logger.info("✅ [%s] Authentication valid (redirect)", account_name)
                         return True, "Authentication successful (redirect)"
+                    session.login_redirected = True
             
+            if probe_error is not None:
+                return False, f"Authentication test error: {str(probe_error)}"
             return False, "Authentication failed - no valid authenticated pages found"
             
+        except DeadlineExceeded:
+            raise
         except Exception as e:
             return False, f"Authentication test error: {str(e)}"
     
+    def get_checkin_attempts(self):
+        """签到尝试顺序：先访问签到页面，再依次尝试各API端点的GET/POST"""
+        # 方法1: 直接访问签到页面
+        attempts = [('page', self.checkin_url)]
+        
+        # 方法2: 尝试API端点
+        api_endpoints = [
+            f"{self.checkin_url}/api/checkin",
+            f"{self.checkin_url}/checkin",
+            f"{self.main_site}/api/checkin",
+            f"{self.main_site}/checkin"
+        ]
+        for endpoint in api_endpoints:
+            attempts.append(('GET', endpoint))
+            attempts.append(('POST', endpoint))
+        
+        return attempts
+    
+    def try_checkin_attempt(self, session, method, url, account_name):
+        """执行单次签到尝试"""
+        if method == 'page':
+            session.phase = 'checkin_page'
+            page = self.fetch_page(session, url)
+            response = page.response
+            self.circuit_breakers.record(self.endpoint_route(session, url), response.status_code < 500)
+            if response.status_code == 200:
+                return self.analyze_and_checkin(session, page, url, account_name)
+        else:
+            session.phase = 'api_endpoint'
+            if method == 'GET':
+                response = session.get(url, stream=True)
+            else:
+                response = session.post(url, data={'checkin': '1'}, stream=True)
+                session.clear_page_cache()
+            self.circuit_breakers.record(self.endpoint_route(session, url), response.status_code < 500)
+            if response.status_code == 200:
+                return self.check_checkin_response(self.read_response_text(response))
+            response.close()
+        
+        return False, f"{method} {url} returned {response.status_code}"
+    
     def perform_checkin(self, session, account_name):
         """执行签到操作"""
-        self.logger.info(f"🎯 [{account_name}] Performing checkin...")
+        self.logger.info("🎯 [%s] Performing checkin...", account_name)
         
         try:
-            # 方法1: 直接访问签到页面
-            response = session.get(self.checkin_url, timeout=30)
-            
-            if response.status_code == 200:
-                result = self.analyze_and_checkin(session, response.text, self.checkin_url, account_name)
-                if result[0]:
-                    return result
+            attempts = self.get_checkin_attempts()
+            account_key = getattr(session, 'account_key', None)
             
-            # 方法2: 尝试API端点
-            api_endpoints = [
-                f"{self.checkin_url}/api/checkin",
-                f"{self.checkin_url}/checkin",
-                f"{self.main_site}/api/checkin",
-                f"{self.main_site}/checkin"
-            ]
+            # 优先尝试上次成功的端点
+            cached = None
+            if account_key:
+                entry = self.endpoint_cache.get(account_key, self.checkin_url)
+                if entry and (entry['method'], entry['url']) in attempts:
+                    cached = (entry['method'], entry['url'])
+                    attempts.remove(cached)
+                    attempts.insert(0, cached)
+                    self.logger.debug("[%s] Using cached checkin endpoint %s %s", account_name, cached[0], cached[1])
             
-            for endpoint in api_endpoints:
+            failed_urls = set()
+            skipped_urls = set()
+            for method, url in attempts:
+                if url in failed_urls:
+                    continue
+                # 熔断中的端点对所有账号跳过
+                route = self.endpoint_route(session, url)
+                if not self.circuit_breakers.allow(route):
+                    skipped_urls.add(url)
+                    continue
+                
                 try:
-                    # GET请求
-                    response = session.get(endpoint, timeout=30)
-                    if response.status_code == 200:
-                        success, message = self.check_checkin_response(response.text)
-                        if success:
-                            return True, message
-                    
-                    # POST请求
-                    response = session.post(endpoint, data={'checkin': '1'}, timeout=30)
-                    if response.status_code == 200:
-                        success, message = self.check_checkin_response(response.text)
-                        if success:
-                            return True, message
-                            
+                    success, message = self.try_checkin_attempt(session, method, url, account_name)
+                except DeadlineExceeded:
+                    raise
                 except Exception as e:
-                    self.logger.debug(f"[{account_name}] API endpoint {endpoint} failed: {str(e)}")
-                    continue
+                    self.logger.debug("[%s] Checkin %s %s failed: %s", account_name, method, url, e)
+                    failed_urls.add(url)
+                    # 只有网络错误（连接失败、超时等）计入端点熔断
+                    if isinstance(e, requests.RequestException):
+                        self.circuit_breakers.record(route, False)
+                    success, message = False, str(e)
+                finally:
+                    # 没有得出结果的探测（超出时间预算或其他异常）释放名额，端点不会被一直跳过
+                    self.circuit_breakers.release(route)
+                
+                if success:
+                    if account_key:
+                        self.endpoint_cache.remember(account_key, self.checkin_url, method, url)
+                    return True, message
+                
+                if (method, url) == cached:
+                    self.logger.info("♻️ [%s] Cached checkin endpoint failed, falling back to full probe", account_name)
+                    self.endpoint_cache.forget(account_key, self.checkin_url)
             
+            if skipped_urls:
+                return False, f"All checkin methods failed ({len(skipped_urls)} endpoints skipped by circuit breaker)"
             return False, "All checkin methods failed"
             
+        except DeadlineExceeded:
+            raise
         except Exception as e:
             return False, f"Checkin error: {str(e)}"
     
-    def analyze_and_checkin(self, session, html_content, page_url, account_name):
-        """分析页面内容并执行签到"""
+    def analyze_and_checkin(self, session, page, page_url, account_name):
+        """分析页面内容并执行签到，page 可以是HTML文本或流式扫描结果"""
+        if isinstance(page, str):
+            page = self.classifier.scan_text(page)
+        
+        # 发现"已签到"即可停止读取，否则需要读完整页
+        page.read_until(lambda scan: 'already' in scan.labels)
+        
         # 检查是否已经签到
-        if self.already_checked_in(html_content):
+        if 'already' in page.labels:
             return True, "Already checked in today"
         
         # 检查是否需要签到
-        if not self.is_checkin_page(html_content):
+        if 'checkin_page' not in page.labels:
             return False, "Not a checkin page"
         
         # 尝试POST签到
@@ -174,142 +494,583 @@ class LeafLowTokenCheckin:
             checkin_data = {'checkin': '1', 'action': 'checkin', 'daily': '1'}
             
             # 提取CSRF token
-            csrf_token = self.extract_csrf_token(html_content)
+            csrf_token = page.csrf_token
             if csrf_token:
                 checkin_data['_token'] = csrf_token
                 checkin_data['csrf_token'] = csrf_token
             
-            response = session.post(page_url, data=checkin_data, timeout=30)
+            session.phase = 'checkin_submit'
+            response = session.post(page_url, data=checkin_data, stream=True)
+            # 页面状态已改变，之前获取的页面不再可信
+            session.clear_page_cache()
             
             if response.status_code == 200:
-                return self.check_checkin_response(response.text)
+                return self.check_checkin_response(self.read_response_text(response))
+            response.close()
                 
+        except DeadlineExceeded:
+            raise
         except Exception as e:
-            self.logger.debug(f"[{account_name}] POST checkin failed: {str(e)}")
+            self.logger.debug("[%s] POST checkin failed: %s", account_name, e)
         
         return False, "Failed to perform checkin"
     
     def already_checked_in(self, html_content):
         """检查是否已经签到"""
-        content_lower = html_content.lower()
-        indicators = [
-            'already checked in', '今日已签到', 'checked in today',
-            'attendance recorded', '已完成签到', 'completed today'
-        ]
-        return any(indicator in content_lower for indicator in indicators)
+        return 'already' in self.classifier.classify(html_content, wanted={'already'})
     
     def is_checkin_page(self, html_content):
         """判断是否是签到页面"""
-        content_lower = html_content.lower()
-        indicators = ['check-in', 'checkin', '签到', 'attendance', 'daily']
-        return any(indicator in content_lower for indicator in indicators)
+        return 'checkin_page' in self.classifier.classify(html_content, wanted={'checkin_page'})
     
     def extract_csrf_token(self, html_content):
         """提取CSRF token"""
-        import re
-        patterns = [
-            r'name=["\']_token["\'][^>]*value=["\']([^"\']+)["\']',
-            r'name=["\']csrf_token["\'][^>]*value=["\']([^"\']+)["\']',
-            r'<meta[^>]*name=["\']csrf-token["\'][^>]*content=["\']([^"\']+)["\']',
-        ]
-        
-        for pattern in patterns:
-            match = re.search(pattern, html_content, re.IGNORECASE)
-            if match:
-                return match.group(1)
-        
-        return None
+        return extract_csrf_token(html_content)
     
     def check_checkin_response(self, html_content):
         """检查签到响应"""
-        content_lower = html_content.lower()
-        
-        success_indicators = [
-            'check-in successful', 'checkin successful', '签到成功',
-            'attendance recorded', 'earned reward', '获得奖励',
-            'success', '成功', 'completed'
-        ]
-        
-        if any(indicator in content_lower for indicator in success_indicators):
+        if 'success' in self.classifier.classify(html_content, wanted={'success'}):
             # 提取奖励信息
-            import re
-            reward_patterns = [
-                r'获得奖励[^\d]*(\d+\.?\d*)\s*元',
-                r'earned.*?(\d+\.?\d*)\s*(credits?|points?)',
-                r'(\d+\.?\d*)\s*(credits?|points?|元)'
-            ]
-            
-            for pattern in reward_patterns:
-                match = re.search(pattern, html_content, re.IGNORECASE)
-                if match:
-                    reward = match.group(1)
-                    return True, f"Check-in successful! Earned {reward} credits"
+            reward = extract_reward(html_content)
+            if reward:
+                return True, f"Check-in successful! Earned {reward} credits"
             
             return True, "Check-in successful!"
         
         return False, "Checkin response indicates failure"
     
-    def perform_token_checkin(self, account_data, account_name):
-        """使用token执行签到"""
+    def perform_token_checkin(self, account_data, account_name, stats=None):
+        """使用token执行签到，stats 字典用于回传请求数等统计信息"""
+        if stats is None:
+            stats = {}
+        stats.setdefault('requests', 0)
+        
         if 'token_data' not in account_data:
             return False, "No token data found in account configuration"
         
+        session = None
+        authenticated = False
         try:
-            session = self.create_session(account_data['token_data'])
+            account_key = self.get_account_key(account_data, account_name)
+            proxy = self.select_proxy(account_data, account_key, account_name)
+            stats['proxy'] = proxy_label(proxy)
+            session = self.create_session(account_data['token_data'], account_key, proxy)
+            self.apply_deadline(session)
+            bind_session(session)
             
             # 测试认证
             auth_result = self.test_authentication(session, account_name)
             if not auth_result[0]:
                 return False, f"Authentication failed: {auth_result[1]}"
+            authenticated = True
             
             # 执行签到
             return self.perform_checkin(session, account_name)
             
+        except DeadlineExceeded as e:
+            # 剩余的签到尝试全部取消
+            stats['timed_out'] = True
+            self.logger.warning("⏰ [%s] %s, remaining attempts cancelled", account_name, e)
+            return False, str(e)
         except Exception as e:
             return False, f"Token checkin error: {str(e)}"
+        finally:
+            if session is not None:
+                stats['requests'] = session.request_count
+                self.metrics.record_session(account_name, session.request_log)
+                stats['bytes'] = sum(record.bytes for record in session.request_log)
+                if self.proxy_pool is not None and session.proxy:
+                    self.proxy_pool.record(session.proxy, session.request_log)
+                self.persist_session(session, account_data, authenticated)
+                self.record_token_status(session, account_data, authenticated)
+                session.close()
     
-    def run_all_accounts(self):
-        """为所有账号执行token签到"""
+    def process_account(self, account_data, account_name, stats=None):
+        """处理单个账号：今天已签到成功的账号（根据签到日志）直接跳过，否则签到并写入日志"""
+        with account_logging(account_name):
+            if stats is None:
+                stats = {}
+            stats.setdefault('requests', 0)
+            
+            account_key = self.get_account_key(account_data, account_name)
+            # 不发送请求的 Cookie 状态预检，今天已完成的账号同样在通知中提示即将过期
+            status, entry, skip = self.preflight_account(account_data, account_key)
+            stats['token_status'] = status
+            stats['expires_at'] = entry.get('expires_at') if entry else None
+            
+            if self.journal is not None and not self.force_rerun:
+                message = self.journal.completed(account_key)
+                if message is not None:
+                    self.logger.info("⏭️ [%s] Already completed today, skipping", account_name)
+                    stats['journal'] = True
+                    return True, message
+            
+            if self.run_deadline is not None and time.monotonic() >= self.run_deadline:
+                stats['timed_out'] = True
+                return False, "Run time budget exceeded before the account started"
+            
+            if skip:
+                self.logger.warning(
+                    "💀 [%s] Cookies expired (last checked %s), skipping without requests",
+                    account_name, format_timestamp(entry.get('checked_at')),
+                )
+                return False, "Cookies expired (detected offline, no requests sent); update token_data to resume"
+            
+            success, message = self.perform_token_checkin(account_data, account_name, stats)
+            # 本次运行可能收到了新的过期时间或认证结果，重新分类供通知使用
+            status, entry, _ = self.preflight_account(account_data, account_key)
+            stats['token_status'] = status
+            stats['expires_at'] = entry.get('expires_at') if entry else None
+            
+            if self.journal is not None:
+                try:
+                    self.journal.record(account_key, account_name, success, message)
+                except Exception as e:
+                    self.logger.warning("⚠️ Failed to write run journal: %s", e)
+            return success, message
+    
+    def preflight_account(self, account_data, account_key):
+        """不发送请求，根据本地记录判断账号 Cookie 状态，返回 (状态, 记录, 是否跳过)
+        
+        上次认证被重定向到登录页，或 remember_web_* Cookie 都已过期时为 expired（leaflow_session 过期不算）；
+        在 settings.expired_recheck_days 内不再发送请求，之后重新验证一次（默认 0：每次运行都验证；--force 时总是验证）。
+        """
+        if self.token_status is None:
+            return 'live', None, False
+        
+        settings = self.config['settings']
+        fingerprint = cookies_fingerprint(account_data.get('token_data', {}).get('cookies'))
+        status, entry = self.token_status.classify(
+            account_key, fingerprint, warning_seconds=float(settings.get('expiry_warning_days', 3)) * 86400,
+        )
+        recheck_after = float(settings.get('expired_recheck_days', 0)) * 86400
+        skip = (
+            status == 'expired' and not self.force_rerun
+            and time.time() - entry.get('checked_at', 0) < recheck_after
+        )
+        return status, entry, skip
+    
+    def preflight(self, account_indexes=None):
+        """预检全部账号（不发送任何请求），输出 live / expiring / expired 统计"""
+        counts = {'live': 0, 'expiring': 0, 'expired': 0}
+        expiring = []
+        expired = []
+        for account_index, account, account_name in self.iter_enabled_accounts(account_indexes, log_skipped=False):
+            account_key = self.get_account_key(account, account_name)
+            status, entry, skip = self.preflight_account(account, account_key)
+            counts[status] += 1
+            if status == 'expiring':
+                expiring.append(f"{account_name} ({format_timestamp(entry['expires_at'])})")
+            elif status == 'expired':
+                expired.append(account_name if skip else f"{account_name} (will recheck)")
+        
+        self.logger.info(
+            "🩺 Preflight: %s live, %s expiring soon, %s expired", counts['live'], counts['expiring'], counts['expired'],
+        )
+        if expiring:
+            self.logger.warning("⌛ Cookies expiring soon: %s", summarize_names(expiring))
+        if expired:
+            self.logger.warning("💀 Cookies expired: %s", summarize_names(expired))
+        return counts
+    
+    def record_token_status(self, session, account_data, authenticated):
+        """记录 remember_web_* Cookie 的过期时间和本次认证结果"""
+        if self.token_status is None or not session.account_key:
+            return
+        
+        if not authenticated and not session.login_redirected:
+            # 只有被重定向到登录页时才认定 Cookie 已失效；网络错误、WAF 拦截、维护页等不改变记录
+            return
+        
+        try:
+            fingerprint = cookies_fingerprint(account_data['token_data'].get('cookies'))
+            self.token_status.record(
+                session.account_key, fingerprint, authenticated, session_cookie_expiry(session.cookies),
+            )
+            self.token_status.save(min_interval=1)
+        except OSError as e:
+            self.logger.warning("⚠️ Failed to save token status: %s", e)
+    
+    def persist_session(self, session, account_data, authenticated):
+        """将轮换后的cookies写回会话状态文件，认证失败时退回使用配置文件中的cookies"""
+        if self.session_store is None or not session.account_key:
+            return
+        
+        try:
+            if authenticated:
+                fingerprint = cookies_fingerprint(account_data['token_data'].get('cookies'))
+                self.session_store.store_cookies(session.account_key, fingerprint, session.cookies)
+            else:
+                self.session_store.discard(session.account_key)
+            self.session_store.save(min_interval=1)
+        except OSError as e:
+            self.logger.warning("⚠️ Failed to save session state: %s", e)
+    
+    def iter_accounts(self):
+        """遍历账号来源：settings.accounts_file 指定的 JSONL 文件（惰性读取），否则为配置中的 accounts 列表"""
+        accounts_file = self.config['settings'].get('accounts_file')
+        if accounts_file:
+            return iter(JsonlAccountSource(accounts_file, self.logger))
+        return enumerate(self.config.get('accounts', []))
+    
+    def iter_enabled_accounts(self, account_indexes=None, log_skipped=True):
+        """按配置顺序遍历启用的账号，返回 (序号, 账号配置, 账号名称)；account_indexes 可限定账号序号"""
+        for account_index, account in self.iter_accounts():
+            if account_indexes is not None and account_index not in account_indexes:
+                continue
+            account_name = f"账号{account_index + 1}"
+            if self.shard is not None and not self.in_shard(account, account_name):
+                continue
+            if not account.get('enabled', True):
+                if log_skipped:
+                    self.logger.info("⏭️ Skipping disabled account: Account%s", account_index+1)
+                continue
+            yield account_index, account, account_name
+    
+    def in_shard(self, account, account_name):
+        """按账号标识的稳定哈希判断账号是否属于当前分片，名单增减不会改变其他账号的分片"""
+        shard_index, shard_count = self.shard
+        account_key = self.get_account_key(account, account_name)
+        digest = hashlib.sha1(account_key.encode('utf-8')).hexdigest()
+        return int(digest[:16], 16) % shard_count == shard_index
+    
+    def record_result(self, results, account_name, success, message, stats=None):
+        """将单个账号结果写入结果文件并输出日志"""
+        stats = stats or {}
+        results.append({
+            'account': account_name,
+            'index': stats.get('index'),
+            'success': success,
+            'message': message,
+            'requests': stats.get('requests', 0),
+            'duration': round(stats.get('duration', 0.0), 3),
+            'timed_out': stats.get('timed_out', False),
+            'bytes': stats.get('bytes', 0),
+            'proxy': stats.get('proxy'),
+            'token_status': stats.get('token_status'),
+            'expires_at': stats.get('expires_at'),
+        })
+        
+        if success:
+            self.logger.info("✅ [%s] %s", account_name, message)
+        else:
+            self.logger.error("❌ [%s] %s", account_name, message)
+    
+    def get_concurrency(self):
+        """读取并发上限，小于等于1时使用顺序模式"""
+        try:
+            return max(1, int(self.config['settings'].get('concurrency', 1)))
+        except (TypeError, ValueError):
+            return 1
+    
+    def results_path(self, day=None):
+        """结果文件路径：settings.results_file（.csv 为 CSV，否则为 JSONL），默认 state_dir/results.jsonl
+        
+        指定 day 时（常驻模式）为带日期的文件，例如 results-2024-01-31.jsonl。
+        """
+        path = self.config['settings'].get('results_file')
+        if not path:
+            # 同一 state_dir 下并行运行的分片各自写入自己的文件
+            suffix = f"-shard-{self.shard[0]}-of-{self.shard[1]}" if self.shard else ''
+            path = self.state_path(f"results{suffix}.jsonl")
+        if day is not None:
+            base, ext = os.path.splitext(path)
+            path = f"{base}-{day.isoformat()}{ext}"
+        return path
+    
+    def open_result_sink(self, day=None):
+        """打开本次运行的结果文件；指定 day 时同一天的多批结果追加到同一文件"""
+        return open_result_sink(self.results_path(day), append=day is not None)
+    
+    def run_all_accounts(self, account_indexes=None, day=None):
+        """为所有账号（或 account_indexes 指定的账号）执行token签到，返回 (成功数, 总数, 结果文件)
+        
+        每个账号完成后立即写入结果文件；返回的 ResultSink 可以多次遍历，逐条读回结果。
+        day 见 open_result_sink。
+        """
         self.logger.info("=" * 60)
         self.logger.info("🔑 LeafLow Token-Based Auto Check-in Started")
         self.logger.info("=" * 60)
-        success_count = 0
-        total_count = 0
-        results = []
+        # 每个请求的明细只有 JSON 报告需要，未配置 report_file 时只保留汇总计数
+        self.metrics = RunMetrics(keep_accounts=bool(self.config['settings'].get('report_file')))
+        run_budget = float(self.config['settings'].get('run_deadline', 0))
+        self.run_deadline = time.monotonic() + run_budget if run_budget > 0 else None
+        rate_controller = self.get_rate_controller()
+        if rate_controller is not None:
+            rate_controller.start_run()
+        if self.token_status is not None:
+            self.preflight(account_indexes)
+        if self.proxy_pool is not None:
+            self.proxy_pool.start_run()
         
-        for account_index, account in enumerate(self.config['accounts']):
-            if not account.get('enabled', True):
-                self.logger.info(f"⏭️ Skipping disabled account: Account{account_index+1}")
-                continue
-                
-            total_count += 1
-            account_name = f"账号{account_index + 1}"
-            self.logger.info(f"\n📋 正在处理 {account_name}...")
-            
-            success, message = self.perform_token_checkin(account, account_name)
-            results.append({
-                'account': account_name,
-                'success': success,
-                'message': message,
-            })
-            
-            if success:
-                self.logger.info(f"✅ [{account_name}] {message}")
-                success_count += 1
+        results = self.open_result_sink(day)
+        concurrency = self.get_concurrency()
+        try:
+            if concurrency > 1:
+                asyncio.run(self.run_accounts_concurrently(results, concurrency, account_indexes))
             else:
-                self.logger.error(f"❌ [{account_name}] {message}")
-            
-            # 账号间延迟
-            if account_index < len(self.config['accounts']) - 1:
-                delay = self.config['settings'].get('retry_delay', 5)
-                self.logger.info(f"⏱️ Waiting {delay} seconds before next account...")
-                time.sleep(delay)
+                self.run_accounts_sequentially(results, account_indexes)
+        finally:
+            results.close()
+        
+        self.save_state()
+        self.metrics.finish()
+        if rate_controller is not None:
+            self.metrics.rate_limits = rate_controller.snapshot()
+        if self.proxy_pool is not None:
+            self.metrics.proxies = self.proxy_pool.snapshot()
+        
+        success_count = results.successful
+        total_count = results.total
         
         self.logger.info("\n" + "=" * 60)
-        self.logger.info(f"🏁 Token check-in completed: {success_count}/{total_count} successful")
+        self.logger.info("🏁 Token check-in completed: %s/%s successful", success_count, total_count)
+        self.logger.info("💾 Results written to %s", results.path)
+        if results.timed_out:
+            timed_out = [result['account'] for result in results if result.get('timed_out')]
+            self.logger.warning("⏰ Out of time budget (%s): %s", len(timed_out), summarize_names(timed_out))
+        if self.transport is not None:
+            stats = self.transport.stats()
+            self.logger.info(
+                "🔌 Connections opened: %s, reused: %s (%s requests)",
+                stats['connections_opened'], stats['connections_reused'], stats['requests_sent'],
+            )
+        if total_count:
+            request_total = results.requests
+            self.logger.info("📨 Requests: %s total, %.1f per account", request_total, request_total / total_count)
+            bytes_total = self.metrics.total_bytes()
+            self.logger.info(
+                "📦 Received: %.1f KiB total, %.1f KiB per account", bytes_total / 1024, bytes_total / 1024 / total_count,
+            )
+        for host in self.metrics.rate_limits:
+            self.logger.info(
+                "🚦 Rate for %s: current %.2f req/s, peak %.2f req/s, throttled %s times, waited %.1fs",
+                host['host'], host['rate'], host['peak_rate'], host['throttled'], host['waited'],
+            )
+        for proxy in self.metrics.proxies:
+            self.logger.info(
+                "🌐 Proxy %s: %s accounts, %s requests, %s failures, health %.2f, latency %s ms",
+                proxy['proxy'], proxy['accounts'], proxy['requests'], proxy['failures'], proxy['health'], proxy['latency_ms'],
+            )
         self.logger.info("=" * 60)
         
+        self.export_metrics(results)
+        
         return success_count, total_count, results
+    
+    def write_results_file(self, path, success_count, total_count, results):
+        """写出本次运行（分片）的 JSONL 结果文件，供 --merge-results 合并
+        
+        第一行为分片信息，之后每行一条结果；结果逐条从结果文件读取写出。
+        """
+        header = {
+            'shard': f"{self.shard[0]}/{self.shard[1]}" if self.shard else None,
+            'finished_at': datetime.now().isoformat(),
+            'success_count': success_count,
+            'total_count': total_count,
+        }
+        with atomic_open(path) as f:
+            f.write(json.dumps(header, ensure_ascii=False) + '\n')
+            for result in results:
+                f.write(json.dumps(result, ensure_ascii=False) + '\n')
+        self.logger.info("💾 Results written to %s", path)
+    
+    def export_metrics(self, results):
+        """导出 JSON 运行报告和 Prometheus textfile"""
+        settings = self.config['settings']
+        
+        if self.logger.isEnabledFor(logging.DEBUG):
+            for endpoint in self.metrics.endpoint_summary()[:3]:
+                self.logger.debug(
+                    "⏱️ %s %s %s: %s requests, %.2fs total",
+                    endpoint['phase'], endpoint['method'], endpoint['endpoint'], endpoint['count'], endpoint['elapsed'],
+                )
+        
+        try:
+            if settings.get('report_file'):
+                self.metrics.write_json(settings['report_file'], results)
+                self.logger.info("📝 Run report written to %s", settings['report_file'])
+            if settings.get('metrics_file'):
+                self.metrics.write_prometheus(settings['metrics_file'], results)
+                self.logger.info("📈 Metrics written to %s", settings['metrics_file'])
+        except OSError as e:
+            self.logger.warning("⚠️ Failed to export metrics: %s", e)
+    
+    def save_state(self):
+        """将本地状态写回磁盘"""
+        try:
+            self.endpoint_cache.save()
+            if self.session_store is not None:
+                self.session_store.save()
+            if self.breaker_state is not None:
+                self.breaker_state.save()
+            if self.proxy_state is not None:
+                self.proxy_state.save()
+            if self.token_status is not None:
+                self.token_status.save()
+            if isinstance(self.transport, RecordingTransport):
+                count = self.transport.save()
+                self.logger.info("🎞️ Recorded %s HTTP exchanges to %s", count, self.transport.path)
+        except OSError as e:
+            self.logger.warning("⚠️ Failed to save local state: %s", e)
+    
+    def shutdown(self):
+        """进程退出前关闭共享连接池，删除回放 cassette 使用的临时状态目录"""
+        with self.transport_lock:
+            if self.transport is not None:
+                self.transport.shutdown()
+                self.transport = None
+        if self.replay_state_dir is not None:
+            if self.journal is not None:
+                self.journal.close()
+                self.journal = None
+            shutil.rmtree(self.replay_state_dir, ignore_errors=True)
+            self.replay_state_dir = None
+    
+    def run_accounts_sequentially(self, results, account_indexes=None):
+        """顺序处理所有账号，结果写入 results"""
+        for account_index, account, account_name in self.iter_enabled_accounts(account_indexes):
+            # 未启用自适应限速时使用固定的账号间延迟（账号来源可能是惰性读取的文件，因此在处理下一个账号前等待；
+            # 上一个账号未发送请求时，例如根据签到日志跳过，无需等待；回放 cassette 时也不等待）
+            settings = self.config['settings']
+            if (
+                self.rate_controller is None and not settings.get('replay_cassette')
+                and results.last and results.last['requests']
+            ):
+                delay = settings.get('retry_delay', 5)
+                self.logger.info("⏱️ Waiting %s seconds before next account...", delay)
+                time.sleep(delay)
+            
+            self.logger.info("\n📋 正在处理 %s...", account_name)
+            
+            stats = {'index': account_index}
+            started = time.perf_counter()
+            success, message = self.process_account(account, account_name, stats)
+            stats['duration'] = time.perf_counter() - started
+            self.record_result(results, account_name, success, message, stats)
+    
+    async def run_accounts_concurrently(self, results, concurrency, account_indexes=None):
+        """并发处理所有账号，每个账号完成后立即写入 results（按完成顺序，index 字段为配置中的序号）"""
+        self.logger.info("⚡ Concurrent mode enabled (concurrency=%s)", concurrency)
+        loop = asyncio.get_running_loop()
+        semaphore = asyncio.Semaphore(concurrency)
+        
+        async def run_one(account_index, account, account_name):
+            try:
+                self.logger.info("\n📋 正在处理 %s...", account_name)
+                stats = {'index': account_index}
+                started = time.perf_counter()
+                # requests 为阻塞调用，放到线程池中执行
+                success, message = await loop.run_in_executor(
+                    executor, self.process_account, account, account_name, stats
+                )
+                stats['duration'] = time.perf_counter() - started
+                # 在事件循环线程中写入，不需要额外加锁
+                self.record_result(results, account_name, success, message, stats)
+            finally:
+                semaphore.release()
+        
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            # 按需从账号来源读取：同一时间只持有 concurrency 个账号的配置和会话
+            tasks = set()
+            errors = []
+            
+            def task_done(task):
+                # 已完成的任务不再保留，但要取出其中的异常，否则只会得到 "Task exception was never retrieved" 警告
+                tasks.discard(task)
+                if not task.cancelled() and task.exception() is not None:
+                    errors.append(task.exception())
+            
+            for account_index, account, account_name in self.iter_enabled_accounts(account_indexes):
+                await semaphore.acquire()
+                task = asyncio.ensure_future(run_one(account_index, account, account_name))
+                tasks.add(task)
+                task.add_done_callback(task_done)
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+            if errors:
+                raise errors[0]
+
+def summarize_names(names, limit=20):
+    """日志中最多列出 limit 个账号"""
+    if len(names) <= limit:
+        return ', '.join(names)
+    return f"{', '.join(names[:limit])} ... and {len(names) - limit} more"
+
+def parse_shard(value):
+    """解析 --shard i/N（i 从 0 开始）"""
+    try:
+        shard_index, shard_count = (int(part) for part in value.split('/'))
+    except ValueError:
+        raise argparse.ArgumentTypeError("shard must look like i/N, e.g. 0/4")
+    if shard_count < 1 or not 0 <= shard_index < shard_count:
+        raise argparse.ArgumentTypeError("shard index must satisfy 0 <= i < N")
+    return shard_index, shard_count
+
+def merge_result_files(paths):
+    """合并各分片的结果文件，按账号在配置中的顺序排列"""
+    results = []
+    for path in paths:
+        with open(path, 'r', encoding='utf-8') as f:
+            f.readline()  # 分片信息
+            results.extend(json.loads(line) for line in f if line.strip())
+    
+    results.sort(key=lambda result: (result.get('index') is None, result.get('index') or 0))
+    success_count = sum(1 for result in results if result['success'])
+    return success_count, len(results), results
+
+def load_notify(logger):
+    """加载通知模块和 config.notify.json，返回 (notify, notify_config)"""
+    notify_config = {}
+    try:
+        import notify
+        
+        # Load notification config if exists
+        if os.path.exists('config.notify.json'):
+            with open('config.notify.json', 'r', encoding='utf-8') as f:
+                notify_config = json.load(f)
+        
+        # 签到期间并行获取一言，发送通知时无需等待
+        notify.push_config.update(notify_config)
+        hitokoto = notify.push_config.get("HITOKOTO")
+        if hitokoto and hitokoto != "false":
+            notify.prefetch_hitokoto()
+        return notify, notify_config
+    except ImportError:
+        logger.warning("⚠️ Notify module not found, skipping notification")
+    except Exception as e:
+        logger.error("❌ Failed to load notification config: %s", e)
+    return None, notify_config
+
+def send_notification(logger, notify, notify_config, success_count, total_count, results):
+    """推送签到结果：按状态和失败原因汇总，只列出有限数量的失败账号"""
+    try:
+        title = "LeafLow Token-Based Auto Check-in Results"
+        # 结果只遍历一次（结果文件逐行读取），正文长度与账号数量无关
+        max_accounts = int(notify.push_config.get('NOTIFY_MAX_ACCOUNTS') or 20)
+        content = build_digest(results, max_accounts)
+        # 超出渠道长度限制时由 notify 拆分为多条消息；后台投递，进程退出前最多等待 NOTIFY_FLUSH_TIMEOUT 秒
+        notify.send(title, content, background=True, **notify_config)
+        logger.info("📱 Notification queued")
+        
+    except Exception as e:
+        logger.error("❌ Failed to send notification: %s", e)
+
+def merge_results(paths, use_notify):
+    """合并分片结果，输出汇总并只发送一条通知"""
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    logger = logging.getLogger(__name__)
+    
+    success_count, total_count, results = merge_result_files(paths)
+    for result in results:
+        status = "✅" if result['success'] else ("⏰" if result.get('timed_out') else "❌")
+        logger.info("%s %s: %s", status, result['account'], result['message'])
+    logger.info("🏁 Merged %s shard result files: %s/%s successful", len(paths), success_count, total_count)
+    
+    if use_notify:
+        notify, notify_config = load_notify(logger)
+        if notify is not None:
+            send_notification(logger, notify, notify_config, success_count, total_count, results)
 
 def main():
     """主函数"""
@@ -318,54 +1079,106 @@ def main():
     parser.add_argument('--debug', action='store_true', help='Enable debug mode')
     parser.add_argument('--notify', action='store_true', help='Enable notification push')
     parser.add_argument('--no-notify', action='store_true', help='Disable notification push')
+    parser.add_argument('--clear-endpoint-cache', action='store_true', help='Clear the learned checkin endpoint cache and exit')
+    parser.add_argument('--report', help='Write a JSON run report with per-request timings (overrides settings.report_file)')
+    parser.add_argument('--metrics-file', help='Write Prometheus textfile metrics (overrides settings.metrics_file)')
+    parser.add_argument('--daemon', action='store_true', help='Stay resident and check in each account at its scheduled daily time')
+    parser.add_argument('--concurrency', type=int, help='Max accounts processed concurrently (overrides settings.concurrency)')
+    parser.add_argument('--force', action='store_true', help='Ignore today\'s run journal and process every account again')
+    parser.add_argument('--preflight', action='store_true', help='Classify accounts as live / expiring / expired from local state without any request and exit')
+    parser.add_argument('--record-cassette', metavar='FILE', help='Record every HTTP exchange (cookies and tokens redacted) to a cassette file')
+    parser.add_argument('--replay-cassette', metavar='FILE', help='Serve HTTP responses from a recorded cassette instead of the network')
+    parser.add_argument('--latency-scale', type=float, default=1.0, help='Multiply recorded latencies when replaying (0 = no delay)')
+    parser.add_argument('--accounts', metavar='FILE', help='Read accounts lazily from a JSONL file, one account per line (overrides settings.accounts_file)')
+    parser.add_argument('--shard', type=parse_shard, metavar='i/N', help='Only process accounts whose identity hashes to shard i of N (0-based)')
+    parser.add_argument('--results-file', metavar='FILE', help='Append each account\'s result to this JSONL or CSV file as soon as it finishes (overrides settings.results_file)')
+    parser.add_argument('--results-out', help='Write this run\'s results to a JSONL file (default with --shard: results-shard-i-of-N.jsonl)')
+    parser.add_argument('--merge-results', nargs='+', metavar='FILE', help='Merge shard result files, print the summary, send one notification and exit')
     
     args = parser.parse_args()
     
+    checkin = None
     try:
-        checkin = LeafLowTokenCheckin(args.config)
+        if args.merge_results:
+            merge_results(args.merge_results, args.notify or (not args.no_notify))
+            return
+        
+        # 命令行参数覆盖的 settings 在打开本地状态之前生效（回放 cassette 时不会触碰真实的 state_dir）
+        overrides = {}
+        if args.concurrency is not None:
+            overrides['concurrency'] = args.concurrency
+        if args.accounts:
+            overrides['accounts_file'] = args.accounts
+        if args.record_cassette:
+            overrides['record_cassette'] = args.record_cassette
+        if args.replay_cassette:
+            overrides['replay_cassette'] = args.replay_cassette
+            overrides['replay_latency_scale'] = args.latency_scale
+        if args.report:
+            overrides['report_file'] = args.report
+        if args.metrics_file:
+            overrides['metrics_file'] = args.metrics_file
+        if args.results_file:
+            overrides['results_file'] = args.results_file
+        
+        checkin = LeafLowTokenCheckin(args.config, settings_overrides=overrides)
+        
+        if args.clear_endpoint_cache:
+            checkin.endpoint_cache.clear()
+            checkin.logger.info("🧹 Checkin endpoint cache cleared")
+            return
+        
+        if args.force:
+            checkin.force_rerun = True
+        if args.replay_cassette:
+            checkin.logger.info("🎞️ Replaying %s (local state in %s)", args.replay_cassette, checkin.config['settings']['state_dir'])
+        if args.shard:
+            checkin.shard = args.shard
+            checkin.logger.info("🧩 Running shard %s/%s", args.shard[0], args.shard[1])
+        
+        if args.preflight:
+            checkin.preflight()
+            return
         
         if args.debug:
             import logging
             logging.getLogger().setLevel(logging.DEBUG)
             checkin.logger.info("🐛 Debug mode enabled")
         
+        # 分片运行时由 --merge-results 统一发送通知
+        notify = None
+        notify_config = {}
+        if (args.notify or (not args.no_notify)) and not args.shard:
+            notify, notify_config = load_notify(checkin.logger)
+        
+        if args.daemon:
+            def on_results(success_count, total_count, results):
+                if notify is not None:
+                    send_notification(checkin.logger, notify, notify_config, success_count, total_count, results)
+            
+            CheckinDaemon(checkin, on_results).run_forever()
+            return
+        
         # 执行签到
         success_count, total_count, results = checkin.run_all_accounts()
         
+        results_out = args.results_out
+        if results_out is None and args.shard:
+            results_out = f"results-shard-{args.shard[0]}-of-{args.shard[1]}.jsonl"
+        if results_out:
+            checkin.write_results_file(results_out, success_count, total_count, results)
+        
         # 通知逻辑
-        if args.notify or (not args.no_notify):
-            try:
-                from notify import send
-                import os
-                import json
-                
-                # Load notification config if exists
-                notify_config = {}
-                if os.path.exists('config.notify.json'):
-                    with open('config.notify.json', 'r', encoding='utf-8') as f:
-                        notify_config = json.load(f)
-                
-                # 构建通知内容
-                title = "LeafLow Token-Based Auto Check-in Results"
-                content_lines = [f"Token check-in completed: {success_count}/{total_count} successful\n"]
-                
-                for result in results:
-                    status = "✅" if result['success'] else "❌"
-                    content_lines.append(f"{status} {result['account']}: {result['message']}")
-                
-                content = "\n".join(content_lines)
-                send(title, content, **notify_config)
-                checkin.logger.info("📱 Notification sent")
-                
-            except ImportError:
-                checkin.logger.warning("⚠️ Notify module not found, skipping notification")
-            except Exception as e:
-                checkin.logger.error(f"❌ Failed to send notification: {str(e)}")
+        if notify is not None:
+            send_notification(checkin.logger, notify, notify_config, success_count, total_count, results)
         
     except KeyboardInterrupt:
         print("\n\n⏸️ User interrupted program")
     except Exception as e:
         print(f"\n\n💥 Program exception: {str(e)}")
+    finally:
+        if checkin is not None:
+            checkin.shutdown()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+LeafLow endpoint circuit breakers
+签到端点熔断器
+
+每个签到端点一个熔断器，同一次运行中的所有账号共享。
+端点连续失败（连接错误、超时或 5xx）达到阈值后熔断，剩余账号直接跳过该端点；
+冷却时间过后只放行一个探测请求，成功则恢复，失败则继续熔断；
+探测请求未得出结果（例如超出时间预算）时释放名额，超过冷却时间仍未返回的探测也不再等待。
+熔断状态可以写入本地状态文件，在多次运行之间保留。
+"""
+
+import threading
+import time
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitBreaker:
+    """单个端点的熔断器"""
+
+    def __init__(self, failure_threshold=3, cooldown=300):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probing = False
+        self.probe_started = 0.0
+
+    def allow(self, now):
+        """是否允许发送请求，返回 (是否允许, 状态是否改变)"""
+        if self.state == CLOSED:
+            return True, False
+        if self.state == OPEN:
+            if now - self.opened_at < self.cooldown:
+                return False, False
+            # 冷却结束，放行一个探测请求
+            self.state = HALF_OPEN
+            self.probing = True
+            self.probe_started = now
+            return True, True
+        # 半开状态下探测请求尚未返回，其他账号继续跳过
+        if self.probing and now - self.probe_started < self.cooldown:
+            return False, False
+        self.probing = True
+        self.probe_started = now
+        return True, False
+
+    def release(self):
+        """探测请求没有得出结果（未调用 record）时释放探测名额"""
+        if self.state == HALF_OPEN:
+            self.probing = False
+
+    def record(self, ok, now):
+        """记录一次请求结果，返回状态是否改变"""
+        previous = self.state
+        self.probing = False
+        if ok:
+            self.state = CLOSED
+            self.failures = 0
+        else:
+            self.failures += 1
+            if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = OPEN
+                self.opened_at = now
+        return self.state != previous
+
+    def to_dict(self):
+        return {'state': self.state, 'failures': self.failures, 'opened_at': self.opened_at}
+
+    def load(self, data):
+        self.state = data.get('state', CLOSED)
+        self.failures = data.get('failures', 0)
+        self.opened_at = data.get('opened_at', 0.0)
+        # 上次运行中未完成的探测不再等待
+        if self.state == HALF_OPEN:
+            self.state = OPEN
+
+
+class CircuitBreakerRegistry:
+    """按端点 URL 管理熔断器，state 为可选的 JsonStateFile，用于跨运行保存熔断状态"""
+
+    def __init__(self, failure_threshold=3, cooldown=300, logger=None, state=None):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.logger = logger
+        self.state = state
+        self.lock = threading.Lock()
+        self.breakers = {}
+        if state is not None:
+            with state.lock:
+                saved = dict(state.data)
+            for url, data in saved.items():
+                self.breaker(url).load(data)
+
+    def breaker(self, url):
+        """获取端点的熔断器（调用方需持有 self.lock 或处于初始化阶段）"""
+        breaker = self.breakers.get(url)
+        if breaker is None:
+            breaker = self.breakers[url] = CircuitBreaker(self.failure_threshold, self.cooldown)
+        return breaker
+
+    def allow(self, url):
+        """端点当前是否可用；熔断冷却结束时放行一个探测请求"""
+        with self.lock:
+            breaker = self.breaker(url)
+            allowed, changed = breaker.allow(time.time())
+            if changed:
+                self.state_changed(url, breaker)
+        return allowed
+
+    def record(self, url, ok):
+        """记录端点的一次请求结果"""
+        with self.lock:
+            breaker = self.breaker(url)
+            if breaker.record(ok, time.time()):
+                self.state_changed(url, breaker)
+
+    def release(self, url):
+        """与 allow() 配对，在 finally 中调用：请求异常退出时释放半开状态的探测名额；已 record 时无影响"""
+        with self.lock:
+            breaker = self.breakers.get(url)
+            if breaker is not None:
+                breaker.release()
+
+    def state_changed(self, url, breaker):
+        if self.logger is not None:
+            if breaker.state == OPEN:
+                self.logger.warning(
+                    "🔌 Circuit breaker opened for %s after %s failures, skipping it for %ss",
+                    url, breaker.failures, breaker.cooldown,
+                )
+            elif breaker.state == HALF_OPEN:
+                self.logger.info("🔎 Circuit breaker half-open for %s, probing with one request", url)
+            else:
+                self.logger.info("✅ Circuit breaker closed for %s", url)
+
+        if self.state is not None:
+            with self.state.lock:
+                if breaker.state == CLOSED:
+                    if self.state.data.pop(url, None) is not None:
+                        self.state.mark_removed(url)
+                else:
+                    self.state.data[url] = breaker.to_dict()
+                    self.state.mark_changed(url)
+
+    def open_endpoints(self):
+        """当前处于熔断状态的端点"""
+        with self.lock:
+            return sorted(url for url, breaker in self.breakers.items() if breaker.state != CLOSED)
@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+LeafLow response classifier
+响应页面分类器
+
+所有指示词在加载时合并为一张去重的词表，每段文本只转换一次小写，
+一次分类即可得到命中的全部类别，不再为每个判断函数重复处理整页 HTML。
+响应正文可按块流式读取，得出结论或达到字节上限后提前停止下载。
+"""
+
+import re
+
+# 各类页面的指示词
+INDICATORS = {
+    # 已登录页面
+    'auth': ['dashboard', 'profile', 'user', 'logout', 'welcome'],
+    # 今日已签到
+    'already': [
+        'already checked in', '今日已签到', 'checked in today',
+        'attendance recorded', '已完成签到', 'completed today'
+    ],
+    # 签到页面
+    'checkin_page': ['check-in', 'checkin', '签到', 'attendance', 'daily'],
+    # 签到成功
+    'success': [
+        'check-in successful', 'checkin successful', '签到成功',
+        'attendance recorded', 'earned reward', '获得奖励',
+        'success', '成功', 'completed'
+    ],
+}
+
+CSRF_PATTERNS = [
+    re.compile(r'name=["\']_token["\'][^>]*value=["\']([^"\']+)["\']', re.IGNORECASE),
+    re.compile(r'name=["\']csrf_token["\'][^>]*value=["\']([^"\']+)["\']', re.IGNORECASE),
+    re.compile(r'<meta[^>]*name=["\']csrf-token["\'][^>]*content=["\']([^"\']+)["\']', re.IGNORECASE),
+]
+
+REWARD_PATTERNS = [
+    re.compile(r'获得奖励[^\d]*(\d+\.?\d*)\s*元', re.IGNORECASE),
+    re.compile(r'earned.*?(\d+\.?\d*)\s*(credits?|points?)', re.IGNORECASE),
+    re.compile(r'(\d+\.?\d*)\s*(credits?|points?|元)', re.IGNORECASE),
+]
+
+# 流式读取时为跨块匹配 CSRF 标签保留的字符数
+CSRF_WINDOW = 4096
+
+
+def extract_csrf_token(text):
+    """按优先级提取 CSRF token"""
+    return search_csrf_token(text)[0]
+
+
+def search_csrf_token(text, patterns=None):
+    """按优先级查找 CSRF token，返回 (token, 命中模式的序号)"""
+    for rank, pattern in enumerate(CSRF_PATTERNS if patterns is None else patterns):
+        match = pattern.search(text)
+        if match:
+            return match.group(1), rank
+    return None, None
+
+
+def read_limited_text(response, max_bytes=None, chunk_size=16384):
+    """读取 stream=True 响应的正文，最多从网络读取 max_bytes 字节，读完后关闭响应"""
+    if response.encoding is None:
+        response.encoding = 'utf-8'
+    parts = []
+    chars_read = 0
+    try:
+        for chunk in response.iter_content(chunk_size=chunk_size, decode_unicode=True):
+            parts.append(chunk)
+            chars_read += len(chunk)
+            if max_bytes and _bytes_read(response, chars_read) >= max_bytes:
+                break
+    finally:
+        response.close()
+    return ''.join(parts)
+
+
+def _bytes_read(response, chars_read):
+    """已从网络读取的字节数（压缩前），无法获取时按已解码的字符数估算"""
+    try:
+        return response.raw.tell()
+    except Exception:
+        return chars_read
+
+
+def extract_reward(text):
+    """提取奖励数值"""
+    for pattern in REWARD_PATTERNS:
+        match = pattern.search(text)
+        if match:
+            return match.group(1)
+    return None
+
+
+class ResponseClassifier:
+    """由所有指示词构建的分类器：每个指示词只检查一次，所属类别均已命中的词直接跳过"""
+
+    def __init__(self, indicators=None):
+        indicators = INDICATORS if indicators is None else indicators
+        labels_for = {}
+        for label, group in indicators.items():
+            for word in group:
+                labels_for.setdefault(word.lower(), set()).add(label)
+
+        # CPython 中 str 的子串查找（C 实现）比纯 Python 自动机或正则多选分支都快，
+        # 因此这里按词查找，但每段文本只转换一次小写
+        self.words = [(word, frozenset(labels)) for word, labels in labels_for.items()]
+        self.max_length = max(len(word) for word in labels_for)
+
+    def classify(self, text, labels=None, wanted=None):
+        """对文本进行分类，返回命中的类别集合；指定 wanted 时只检查这些类别"""
+        labels = set() if labels is None else labels
+        lowered = text.lower()
+        for word, word_labels in self.words:
+            if wanted is not None and word_labels.isdisjoint(wanted):
+                continue
+            if not word_labels <= labels and word in lowered:
+                labels |= word_labels
+        return labels
+
+    def scan_text(self, text):
+        """对完整文本进行分类"""
+        page = PageScan(self, [text], keep_text=True)
+        return page.read_until()
+
+    def scan_response(self, response, keep_text=False, chunk_size=16384, max_bytes=None):
+        """对 stream=True 的响应按块分类，正文按需读取，最多读取 max_bytes 字节"""
+        if response.encoding is None:
+            response.encoding = 'utf-8'
+        chunks = response.iter_content(chunk_size=chunk_size, decode_unicode=True)
+        return PageScan(self, chunks, keep_text=keep_text, response=response, max_bytes=max_bytes)
+
+
+class PageScan:
+    """流式页面扫描结果：已命中的类别、CSRF token，以及（可选）已读取的正文"""
+
+    def __init__(self, classifier, chunks, keep_text=False, response=None, max_bytes=None):
+        self.classifier = classifier
+        self.response = response
+        self.max_bytes = max_bytes
+        self.labels = set()
+        self.csrf_token = None
+        self.csrf_rank = None
+        self.complete = False
+        self.truncated = False
+        self.chars_read = 0
+        self._chunks = iter(chunks)
+        self._parts = [] if keep_text else None
+        self._indicator_tail = ''
+        self._csrf_tail = ''
+
+    def feed(self, chunk):
+        """处理一个文本块，保留块尾部以匹配跨块的指示词和标签"""
+        self.chars_read += len(chunk)
+        if self._parts is not None:
+            self._parts.append(chunk)
+
+        window = self._indicator_tail + chunk
+        self.classifier.classify(window, self.labels)
+        self._indicator_tail = window[-(self.classifier.max_length - 1):]
+
+        # 已找到的 token 可能来自低优先级模式，继续只查找更高优先级的模式
+        if self.csrf_rank != 0:
+            window = self._csrf_tail + chunk
+            patterns = CSRF_PATTERNS if self.csrf_rank is None else CSRF_PATTERNS[:self.csrf_rank]
+            token, rank = search_csrf_token(window, patterns)
+            if token is not None:
+                self.csrf_token, self.csrf_rank = token, rank
+            self._csrf_tail = window[-CSRF_WINDOW:]
+
+    def read_until(self, stop=None):
+        """继续读取直到 stop(self) 为真、正文读完或达到字节上限"""
+        if self.complete or (stop is not None and stop(self)):
+            return self
+        for chunk in self._chunks:
+            self.feed(chunk)
+            if stop is not None and stop(self):
+                return self
+            if self.max_bytes and self.bytes_read() >= self.max_bytes:
+                # 超出上限的部分不再下载，按已读取的内容判断
+                self.truncated = True
+                self.close()
+                break
+        self.complete = True
+        return self
+
+    def bytes_read(self):
+        if self.response is None:
+            return self.chars_read
+        return _bytes_read(self.response, self.chars_read)
+
+    @property
+    def text(self):
+        """已读取的正文（仅 keep_text=True 时可用）"""
+        return ''.join(self._parts) if self._parts is not None else None
+
+    def close(self):
+        """提前停止时关闭底层响应"""
+        if self.response is not None:
+            self.response.close()
@@ -3,20 +3,33 @@
 """
 Cookie Token Extraction Helper for GitHub Actions
 
-This script extracts individual cookie tokens from a full cookie string
-and saves them in the required JSON format for the check-in script.
+This script extracts individual cookie tokens from full cookie strings
+and merges them into the account roster used by the check-in script.
+
+Each non-empty line of the input is one account's cookie string. Accounts
+are deduplicated by their long-lived remember_web_* cookie (leaflow_session
+only when there is none, since the site rotates it) and merged into the
+existing roster: known accounts get their cookies refreshed, new accounts
+are appended, everything else is kept.
 
 Usage:
     python get_tokens_helper.py
+    python get_tokens_helper.py --file cookies.txt
+    cat cookies.txt | python get_tokens_helper.py --file - --output accounts.jsonl
     
-For GitHub Actions: Set LEAFLOW_COOKIES environment variable
+For GitHub Actions: Set LEAFLOW_COOKIES environment variable (one cookie string per line)
 For local testing: Use the hardcoded cookie string in this file
 """
 
+import argparse
 import json
 import os
+import sys
 from urllib.parse import unquote
 
+from account_source import AccountRecordError, session_identity, validate_account
+from state_store import atomic_open, cookies_fingerprint
+
 def parse_cookie_string(cookie_string):
     """
     Parse a cookie string into a dictionary.
@@ -39,38 +52,179 @@ def parse_cookie_string(cookie_string):
     
     return cookies
 
-def create_config_from_cookies(cookies):
+def default_settings():
+    """
+    Settings written when a new config.accounts.json is created.
+    """
+    return {
+        "log_level": "INFO",
+        "retry_delay": 3,
+        "timeout": 30,
+        "user_agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/131.0.0.0 Safari/537.36"
+    }
+
+def account_identity(account):
     """
-    Create the configuration structure from parsed cookies.
+    Identity used to deduplicate accounts.
     
     Args:
-        cookies: Dictionary of cookie name-value pairs
+        account: Account entry with token_data.cookies
         
     Returns:
-        Configuration dictionary
-    """
-    config = {
-        "settings": {
-            "log_level": "INFO",
-            "retry_delay": 3,
-            "timeout": 30,
-            "user_agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/131.0.0.0 Safari/537.36"
-        },
-        "accounts": [
-            {
-                "token_data": {
-                    "cookies": cookies
-                }
-            }
-        ]
-    }
+        The remember_web_* cookie digest (same key the check-in script uses
+        for its journal and session store), which survives cookie refreshes
+        because only leaflow_session is rotated; the leaflow_session digest
+        when there is no remember_web_* cookie, or a digest of all cookies
+        when the account has no session cookie at all
+    """
+    cookies = account.get('token_data', {}).get('cookies', {})
+    return session_identity(cookies) or f"cookies:{cookies_fingerprint(cookies)[:16]}"
+
+def iter_cookie_lines(stream, source):
+    """
+    Yield (source, line_number, cookie_string) for each non-empty line.
+    
+    Lines starting with # are comments.
+    """
+    for line_number, line in enumerate(stream, 1):
+        line = line.strip()
+        if line and not line.startswith('#'):
+            yield source, line_number, line
+
+def iter_cookie_sources(files, env_value):
+    """
+    Yield cookie string lines from the given files ('-' for stdin),
+    or from the LEAFLOW_COOKIES value when no file is given.
+    """
+    if not files:
+        yield from iter_cookie_lines(env_value.splitlines(), 'LEAFLOW_COOKIES')
+        return
     
-    return config
+    for path in files:
+        if path == '-':
+            yield from iter_cookie_lines(sys.stdin, '<stdin>')
+        else:
+            with open(path, 'r', encoding='utf-8') as f:
+                yield from iter_cookie_lines(f, path)
+
+def collect_accounts(cookie_lines, stats):
+    """
+    Parse cookie strings into accounts, deduplicated by identity.
+    
+    Args:
+        cookie_lines: Iterable of (source, line_number, cookie_string)
+        stats: Counter dictionary updated in place
+        
+    Returns:
+        Dictionary of identity -> account, in input order (later lines win)
+    """
+    accounts = {}
+    
+    for source, line_number, cookie_string in cookie_lines:
+        account = {"token_data": {"cookies": parse_cookie_string(cookie_string)}}
+        try:
+            validate_account(account)
+        except AccountRecordError as e:
+            stats['invalid'] += 1
+            print(f"⚠️ Skipping {source}:{line_number}: {e}")
+            continue
+        
+        identity = account_identity(account)
+        if identity in accounts:
+            stats['duplicates'] += 1
+        accounts[identity] = account
+    
+    return accounts
+
+def merge_account(existing, incoming, stats):
+    """
+    Refresh an existing roster entry with newly imported cookies,
+    keeping its other fields (name, enabled, headers, ...).
+    """
+    token_data = existing.setdefault('token_data', {})
+    if token_data.get('cookies') == incoming['token_data']['cookies']:
+        stats['unchanged'] += 1
+    else:
+        token_data['cookies'] = incoming['token_data']['cookies']
+        stats['updated'] += 1
+    return existing
+
+def merge_into_json(output_file, accounts, stats):
+    """
+    Merge accounts into a config.accounts.json style file.
+    """
+    if os.path.exists(output_file):
+        with open(output_file, 'r', encoding='utf-8') as f:
+            config = json.load(f)
+    else:
+        config = {"settings": default_settings(), "accounts": []}
+    
+    roster = config.setdefault('accounts', [])
+    for index, existing in enumerate(roster):
+        try:
+            identity = account_identity(validate_account(existing))
+        except AccountRecordError:
+            continue
+        if identity in accounts:
+            roster[index] = merge_account(existing, accounts.pop(identity), stats)
+    
+    stats['added'] += len(accounts)
+    roster.extend(accounts.values())
+    
+    with atomic_open(output_file) as f:
+        json.dump(config, f, indent=2, ensure_ascii=False)
+    return len(roster)
+
+def merge_into_jsonl(output_file, accounts, stats):
+    """
+    Merge accounts into a JSONL account file (one account per line).
+    
+    The existing file is streamed line by line into the new one, so the
+    roster is never loaded into memory; lines that are not valid accounts
+    are copied through unchanged and not counted in the returned total.
+    """
+    total = 0
+    
+    with atomic_open(output_file) as out:
+        if os.path.exists(output_file):
+            with open(output_file, 'r', encoding='utf-8') as f:
+                for line in f:
+                    stripped = line.strip()
+                    if not stripped:
+                        continue
+                    try:
+                        existing = validate_account(json.loads(stripped))
+                    except (ValueError, AccountRecordError):
+                        out.write(stripped + '\n')
+                        continue
+                    total += 1
+                    identity = account_identity(existing)
+                    if identity in accounts:
+                        existing = merge_account(existing, accounts.pop(identity), stats)
+                    out.write(json.dumps(existing, ensure_ascii=False) + '\n')
+        
+        stats['added'] += len(accounts)
+        for account in accounts.values():
+            out.write(json.dumps(account, ensure_ascii=False) + '\n')
+            total += 1
+    
+    return total
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Import LeafLow cookie strings into the account roster')
+    parser.add_argument('--file', action='append', metavar='FILE',
+                        help='Read cookie strings (one per line) from FILE, "-" for stdin; may be repeated')
+    parser.add_argument('--output', default='config.accounts.json', metavar='FILE',
+                        help='Roster to merge into (default: config.accounts.json)')
+    parser.add_argument('--format', choices=['auto', 'json', 'jsonl'], default='auto',
+                        help='Roster format; auto picks jsonl for .jsonl files (default: auto)')
+    return parser.parse_args()
 
 def main():
     """
-    Main function to extract tokens and create config file.
+    Main function to extract tokens and merge them into the roster.
     """
+    args = parse_args()
     
     # For GitHub Actions: Read from environment variable
     cookie_string = os.environ.get('LEAFLOW_COOKIES', '')
@@ -80,36 +234,49 @@ def main():
     if not cookie_string:
         cookie_string = """your_cookie_string_here"""
     
-    if not cookie_string:
+    if not args.file and not cookie_string:
         print("❌ No cookie string provided!")
         print("For GitHub Actions: Set LEAFLOW_COOKIES environment variable")
-        print("For local testing: Add cookie string to this script")
+        print("For local testing: Add cookie string to this script, or use --file")
         return False
     
-    print("📝 Parsing cookie string...")
+    print("📝 Parsing cookie strings...")
     
-    # Parse the cookie string
-    cookies = parse_cookie_string(cookie_string)
+    stats = dict.fromkeys(('invalid', 'duplicates', 'added', 'updated', 'unchanged'), 0)
+    accounts = collect_accounts(iter_cookie_sources(args.file, cookie_string), stats)
     
-    # Display found cookies
-    print(f"✅ Found {len(cookies)} cookies:")
-    for name in cookies.keys():
-        # Show first few chars of value for verification (masked for security)
-        value_preview = cookies[name][:20] + "..." if len(cookies[name]) > 20 else cookies[name]
-        print(f"  - {name}: {value_preview}")
+    if not accounts:
+        print("❌ No valid cookie strings found!")
+        return False
     
-    # Create configuration
-    config = create_config_from_cookies(cookies)
+    if len(accounts) == 1:
+        # Display found cookies
+        cookies = next(iter(accounts.values()))['token_data']['cookies']
+        print(f"✅ Found {len(cookies)} cookies:")
+        for name in cookies.keys():
+            # Show first few chars of value for verification (masked for security)
+            value_preview = cookies[name][:20] + "..." if len(cookies[name]) > 20 else cookies[name]
+            print(f"  - {name}: {value_preview}")
+    else:
+        print(f"✅ Found {len(accounts)} accounts ({stats['duplicates']} duplicate lines, {stats['invalid']} invalid lines)")
     
-    # Save to file
-    output_file = "config.accounts.json"
-    print(f"\n💾 Saving configuration to {output_file}...")
+    output_file = args.output
+    output_format = args.format
+    if output_format == 'auto':
+        output_format = 'jsonl' if output_file.endswith('.jsonl') else 'json'
     
-    with open(output_file, 'w', encoding='utf-8') as f:
-        json.dump(config, f, indent=2, ensure_ascii=False)
+    print(f"\n💾 Merging accounts into {output_file}...")
+    
+    if output_format == 'jsonl':
+        total = merge_into_jsonl(output_file, accounts, stats)
+    else:
+        total = merge_into_json(output_file, accounts, stats)
     
-    print(f"✅ Configuration saved successfully!")
-    print(f"📄 You can now run: python checkin_token.py")
+    print(f"✅ Roster saved: {stats['added']} added, {stats['updated']} updated, {stats['unchanged']} unchanged, {total} accounts total")
+    if output_format == 'jsonl':
+        print(f"📄 You can now run: python checkin_token.py --accounts {output_file}")
+    else:
+        print(f"📄 You can now run: python checkin_token.py")
     
     return True
 
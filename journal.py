@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+LeafLow run journal
+每日签到日志（SQLite）
+
+每个账号处理完成后立即把当天的结果写入 state_dir 下的 SQLite 数据库。
+运行中断或手动重跑时，今天已经签到成功的账号直接跳过，不发送任何请求；
+--force 可忽略日志重新处理全部账号。
+"""
+
+import os
+import sqlite3
+import threading
+from datetime import date, datetime, timedelta
+
+
+class RunJournal:
+    """按 (账号标识, 日期) 记录签到结果"""
+
+    def __init__(self, path, retention_days=30):
+        self.path = path
+        self.lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        # 并发模式下由线程池中的线程写入，统一通过 self.lock 串行化
+        self.connection = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        with self.lock, self.connection:
+            self.connection.execute('PRAGMA journal_mode=WAL')
+            self.connection.execute(
+                'CREATE TABLE IF NOT EXISTS checkins ('
+                ' account_key TEXT NOT NULL,'
+                ' day TEXT NOT NULL,'
+                ' account_name TEXT,'
+                ' success INTEGER NOT NULL,'
+                ' message TEXT,'
+                ' finished_at TEXT NOT NULL,'
+                ' PRIMARY KEY (account_key, day))'
+            )
+            if retention_days:
+                cutoff = (date.today() - timedelta(days=retention_days)).isoformat()
+                self.connection.execute('DELETE FROM checkins WHERE day < ?', (cutoff,))
+
+    def completed(self, account_key, day=None):
+        """返回账号在指定日期（默认今天）签到成功时记录的消息，未完成时返回 None"""
+        day = (day or date.today()).isoformat()
+        with self.lock:
+            row = self.connection.execute(
+                'SELECT message FROM checkins WHERE account_key = ? AND day = ? AND success = 1',
+                (account_key, day),
+            ).fetchone()
+        return row[0] if row else None
+
+    def record(self, account_key, account_name, success, message, day=None):
+        """记录账号的处理结果；同一天已成功的记录不会被之后的失败覆盖"""
+        day = (day or date.today()).isoformat()
+        with self.lock, self.connection:
+            self.connection.execute(
+                'INSERT INTO checkins (account_key, day, account_name, success, message, finished_at)'
+                ' VALUES (?, ?, ?, ?, ?, ?)'
+                ' ON CONFLICT (account_key, day) DO UPDATE SET'
+                ' account_name = excluded.account_name, success = excluded.success,'
+                ' message = excluded.message, finished_at = excluded.finished_at'
+                ' WHERE checkins.success = 0 OR excluded.success = 1',
+                (account_key, day, account_name, int(bool(success)), message, datetime.now().isoformat()),
+            )
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+LeafLow logging pipeline
+异步日志
+
+签到线程只把日志记录放入队列，由 QueueListener 的后台线程负责格式化和写入，
+并发处理账号时不会在文件/终端 handler 的锁上互相等待。
+日志文件按大小（或按时间）轮转，可选 JSON Lines 格式，每行附带账号和请求阶段字段。
+"""
+
+import atexit
+import contextlib
+import contextvars
+import copy
+import json
+import logging
+import logging.handlers
+import queue
+from datetime import datetime
+
+TEXT_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+
+# 当前线程正在处理的账号（以及其会话，用于读取请求阶段）
+_account_context = contextvars.ContextVar('leaflow_account_context', default=None)
+_listener = None
+
+
+class AccountContext:
+    __slots__ = ('account', 'session')
+
+    def __init__(self, account, session=None):
+        self.account = account
+        self.session = session
+
+
+@contextlib.contextmanager
+def account_logging(account_name):
+    """with 块内产生的日志都关联到该账号"""
+    token = _account_context.set(AccountContext(account_name))
+    try:
+        yield
+    finally:
+        _account_context.reset(token)
+
+
+def current_account():
+    """当前线程正在处理的账号名称"""
+    context = _account_context.get()
+    return context.account if context is not None else None
+
+
+def bind_session(session):
+    """关联当前账号的会话，日志中的 phase 字段取自 session.phase"""
+    context = _account_context.get()
+    if context is not None:
+        context.session = session
+
+
+class AccountContextFilter(logging.Filter):
+    """在产生日志的线程中为记录附加 account / phase 字段"""
+
+    def filter(self, record):
+        context = _account_context.get()
+        record.account = context.account if context is not None else None
+        record.phase = getattr(context.session, 'phase', None) if context is not None else None
+        return True
+
+
+class JsonLinesFormatter(logging.Formatter):
+    """每条日志输出为一行 JSON"""
+
+    def format(self, record):
+        entry = {
+            'time': datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage().strip(),
+            'account': getattr(record, 'account', None),
+            'phase': getattr(record, 'phase', None),
+        }
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry['exception'] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class AccountQueueHandler(logging.handlers.QueueHandler):
+    """放入队列前在产生日志的线程中格式化异常，保存在 exc_text 中（默认实现会把 traceback 拼进 message 并清空 exc_text）"""
+
+    _exception_formatter = logging.Formatter()
+
+    def prepare(self, record):
+        exception = record.exc_text
+        if record.exc_info:
+            exception = self._exception_formatter.formatException(record.exc_info)
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        # exc_info 中的 traceback 对象不能跨线程保留；文本格式由 Formatter 根据 exc_text 追加
+        record.exc_info = None
+        record.exc_text = exception
+        return record
+
+
+def create_file_handler(settings, log_file):
+    """日志文件 handler：settings.log_rotate_when 设置时按时间轮转，否则按 log_max_bytes 大小轮转"""
+    backup_count = int(settings.get('log_backup_count', 5))
+    when = settings.get('log_rotate_when')
+    if when:
+        return logging.handlers.TimedRotatingFileHandler(
+            log_file, when=when, backupCount=backup_count, encoding='utf-8'
+        )
+    return logging.handlers.RotatingFileHandler(
+        log_file, maxBytes=int(settings.get('log_max_bytes', 10 * 1024 * 1024)),
+        backupCount=backup_count, encoding='utf-8',
+    )
+
+
+def configure_logging(settings, log_file='leaflow_token_checkin.log'):
+    """为根 logger 安装队列 handler，文件和终端输出由后台线程完成；重复调用只调整日志级别"""
+    global _listener
+
+    root = logging.getLogger()
+    root.setLevel(getattr(logging, settings.get('log_level', 'INFO').upper()))
+    if _listener is not None:
+        return _listener
+
+    file_handler = create_file_handler(settings, log_file)
+    if settings.get('log_format', 'text') == 'json':
+        file_handler.setFormatter(JsonLinesFormatter())
+    else:
+        file_handler.setFormatter(logging.Formatter(TEXT_FORMAT))
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(logging.Formatter(TEXT_FORMAT))
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = AccountQueueHandler(log_queue)
+    queue_handler.addFilter(AccountContextFilter())
+    root.addHandler(queue_handler)
+
+    _listener = logging.handlers.QueueListener(log_queue, file_handler, stream_handler)
+    _listener.start()
+    # 退出前写完队列中剩余的日志
+    atexit.register(_listener.stop)
+    return _listener
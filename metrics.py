@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+LeafLow run metrics
+签到过程的请求级计时统计与导出
+
+每个请求记录阶段（认证探测、签到页面、签到提交、API端点）、URL、方法、状态码、耗时和字节数，
+按账号和端点汇总，运行结束时导出为 JSON 报告和 Prometheus textfile。
+"""
+
+import threading
+import time
+from datetime import datetime
+from urllib.parse import urlsplit
+
+from state_store import atomic_write_json, atomic_write_text
+
+
+def endpoint_label(url):
+    """端点标签：去掉查询参数的 scheme://host/path"""
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}{parts.path or '/'}"
+
+
+def response_size(response):
+    """从网络读取的字节数（压缩前），无法获取时退回解码后的正文长度"""
+    raw = getattr(response, 'raw', None)
+    try:
+        size = raw.tell()
+        if size:
+            return size
+    except Exception:
+        pass
+    content = getattr(response, '_content', None)
+    return len(content) if isinstance(content, bytes) else 0
+
+
+class RequestRecord:
+    """单个请求的计时记录，字节数在会话结束时补全（流式响应此前尚未读完）"""
+
+    __slots__ = ('phase', 'method', 'url', 'status', 'elapsed', 'bytes', 'error', 'response')
+
+    def __init__(self, phase, method, url):
+        self.phase = phase
+        self.method = method
+        self.url = url
+        self.status = None
+        self.elapsed = 0.0
+        self.bytes = 0
+        self.error = None
+        self.response = None
+
+    def finalize(self):
+        if self.response is not None:
+            self.bytes = response_size(self.response)
+            self.response = None
+
+    def to_dict(self):
+        return {
+            'phase': self.phase,
+            'method': self.method,
+            'url': self.url,
+            'status': self.status,
+            'elapsed': round(self.elapsed, 6),
+            'bytes': self.bytes,
+            'error': self.error,
+        }
+
+
+def _new_bucket():
+    return {'count': 0, 'errors': 0, 'elapsed': 0.0, 'max_elapsed': 0.0, 'bytes': 0}
+
+
+def _add(bucket, record):
+    bucket['count'] += 1
+    bucket['elapsed'] += record.elapsed
+    bucket['max_elapsed'] = max(bucket['max_elapsed'], record.elapsed)
+    bucket['bytes'] += record.bytes
+    if record.error is not None or (record.status or 0) >= 400:
+        bucket['errors'] += 1
+
+
+class RunMetrics:
+    """一次运行的请求统计；keep_accounts=False 时只保留按端点汇总的计数，内存占用不随账号数量增长"""
+
+    def __init__(self, keep_accounts=True):
+        self.keep_accounts = keep_accounts
+        self.lock = threading.Lock()
+        self.started_at = time.time()
+        self.finished_at = None
+        self.accounts = {}
+        self.endpoints = {}
+        self.status_counts = {}
+        # 运行结束时由 RateController.snapshot() 填入的按主机速率
+        self.rate_limits = []
+        # 运行结束时由 ProxyPool.snapshot() 填入的代理使用情况
+        self.proxies = []
+
+    def record_session(self, account_name, records):
+        """会话结束时登记该账号的全部请求（每个请求的明细只在 keep_accounts 时保留，用于 JSON 报告）"""
+        account = None
+        if self.keep_accounts:
+            account = {'requests': [], 'phases': {}, 'total': _new_bucket()}
+        for record in records:
+            record.finalize()
+            if account is not None:
+                account['requests'].append(record.to_dict())
+                _add(account['total'], record)
+                _add(account['phases'].setdefault(record.phase, _new_bucket()), record)
+
+        with self.lock:
+            if account is not None:
+                self.accounts[account_name] = account
+            for record in records:
+                key = (record.phase, record.method, endpoint_label(record.url))
+                _add(self.endpoints.setdefault(key, _new_bucket()), record)
+                status_key = key + (str(record.status) if record.status is not None else 'error',)
+                self.status_counts[status_key] = self.status_counts.get(status_key, 0) + 1
+
+    def finish(self):
+        self.finished_at = time.time()
+
+    def total_bytes(self):
+        """本次运行从网络读取的响应字节数"""
+        with self.lock:
+            return sum(bucket['bytes'] for bucket in self.endpoints.values())
+
+    def endpoint_summary(self):
+        """按耗时降序排列的端点汇总"""
+        with self.lock:
+            items = list(self.endpoints.items())
+        summary = []
+        for (phase, method, endpoint), bucket in items:
+            summary.append(dict(
+                phase=phase, method=method, endpoint=endpoint,
+                avg_elapsed=round(bucket['elapsed'] / bucket['count'], 6) if bucket['count'] else 0,
+                **bucket,
+            ))
+        summary.sort(key=lambda item: item['elapsed'], reverse=True)
+        return summary
+
+    def build_report(self, results):
+        """生成 JSON 运行报告"""
+        finished_at = self.finished_at or time.time()
+        with self.lock:
+            accounts = dict(self.accounts)
+        return {
+            'started_at': datetime.fromtimestamp(self.started_at).isoformat(),
+            'finished_at': datetime.fromtimestamp(finished_at).isoformat(),
+            'duration': round(finished_at - self.started_at, 3),
+            'accounts_total': len(results),
+            'accounts_successful': sum(1 for result in results if result['success']),
+            'bytes_received': self.total_bytes(),
+            'rate_limits': self.rate_limits,
+            'proxies': self.proxies,
+            'endpoints': self.endpoint_summary(),
+            'accounts': [
+                dict(result, metrics=accounts.get(result['account']))
+                for result in results
+            ],
+        }
+
+    def write_json(self, path, results):
+        atomic_write_json(path, self.build_report(results))
+
+    def write_prometheus(self, path, results):
+        """写出 node_exporter textfile collector 格式的指标"""
+        finished_at = self.finished_at or time.time()
+        successful = sum(1 for result in results if result['success'])
+
+        def labels(phase, method, endpoint, **extra):
+            pairs = dict(phase=phase, method=method, endpoint=endpoint, **extra)
+            return ','.join(f'{name}="{_escape(value)}"' for name, value in pairs.items())
+
+        lines = [
+            '# HELP leaflow_checkin_accounts Accounts processed in the last run by result.',
+            '# TYPE leaflow_checkin_accounts gauge',
+            f'leaflow_checkin_accounts{{result="success"}} {successful}',
+            f'leaflow_checkin_accounts{{result="failure"}} {len(results) - successful}',
+            '# HELP leaflow_checkin_run_duration_seconds Wall-clock duration of the last run.',
+            '# TYPE leaflow_checkin_run_duration_seconds gauge',
+            f'leaflow_checkin_run_duration_seconds {finished_at - self.started_at:.3f}',
+            '# HELP leaflow_checkin_last_run_timestamp_seconds Unix time the last run finished.',
+            '# TYPE leaflow_checkin_last_run_timestamp_seconds gauge',
+            f'leaflow_checkin_last_run_timestamp_seconds {finished_at:.0f}',
+        ]
+
+        with self.lock:
+            status_counts = sorted(self.status_counts.items())
+            endpoints = sorted(self.endpoints.items())
+
+        lines += [
+            '# HELP leaflow_checkin_requests Requests sent in the last run.',
+            '# TYPE leaflow_checkin_requests gauge',
+        ]
+        for (phase, method, endpoint, status), count in status_counts:
+            lines.append(f'leaflow_checkin_requests{{{labels(phase, method, endpoint, status=status)}}} {count}')
+
+        lines += [
+            '# HELP leaflow_checkin_request_duration_seconds Time spent on requests in the last run.',
+            '# TYPE leaflow_checkin_request_duration_seconds summary',
+        ]
+        for (phase, method, endpoint), bucket in endpoints:
+            label_text = labels(phase, method, endpoint)
+            lines.append(f'leaflow_checkin_request_duration_seconds_sum{{{label_text}}} {bucket["elapsed"]:.6f}')
+            lines.append(f'leaflow_checkin_request_duration_seconds_count{{{label_text}}} {bucket["count"]}')
+
+        lines += [
+            '# HELP leaflow_checkin_response_bytes Response bytes received in the last run.',
+            '# TYPE leaflow_checkin_response_bytes gauge',
+        ]
+        for (phase, method, endpoint), bucket in endpoints:
+            lines.append(f'leaflow_checkin_response_bytes{{{labels(phase, method, endpoint)}}} {bucket["bytes"]}')
+
+        if self.rate_limits:
+            lines += [
+                '# HELP leaflow_checkin_rate_limit Requests per second allowed per host at the end of the last run.',
+                '# TYPE leaflow_checkin_rate_limit gauge',
+            ]
+            for host in self.rate_limits:
+                lines.append(f'leaflow_checkin_rate_limit{{host="{_escape(host["host"])}"}} {host["rate"]}')
+            lines += [
+                '# HELP leaflow_checkin_rate_limit_peak Highest requests per second allowed per host in the last run.',
+                '# TYPE leaflow_checkin_rate_limit_peak gauge',
+            ]
+            for host in self.rate_limits:
+                lines.append(f'leaflow_checkin_rate_limit_peak{{host="{_escape(host["host"])}"}} {host["peak_rate"]}')
+            lines += [
+                '# HELP leaflow_checkin_throttled_responses Responses that slowed a host down (429, 5xx, timeouts).',
+                '# TYPE leaflow_checkin_throttled_responses gauge',
+            ]
+            for host in self.rate_limits:
+                lines.append(f'leaflow_checkin_throttled_responses{{host="{_escape(host["host"])}"}} {host["throttled"]}')
+
+        if self.proxies:
+            lines += [
+                '# HELP leaflow_checkin_proxy_accounts Accounts routed through each proxy in the last run.',
+                '# TYPE leaflow_checkin_proxy_accounts gauge',
+            ]
+            for proxy in self.proxies:
+                lines.append(f'leaflow_checkin_proxy_accounts{{proxy="{_escape(proxy["proxy"])}"}} {proxy["accounts"]}')
+            lines += [
+                '# HELP leaflow_checkin_proxy_health Proxy health score (moving success ratio) at the end of the last run.',
+                '# TYPE leaflow_checkin_proxy_health gauge',
+            ]
+            for proxy in self.proxies:
+                lines.append(f'leaflow_checkin_proxy_health{{proxy="{_escape(proxy["proxy"])}"}} {proxy["health"]}')
+
+        atomic_write_text(path, '\n'.join(lines) + '\n')
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
@@ -1,10 +1,13 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
+import atexit
 import json
 import os
 import re
 import threading
+import time
 import requests
+from requests.adapters import HTTPAdapter
 
 _print = print
 mutex = threading.Lock()
@@ -22,7 +25,18 @@ push_config = {
     'CONSOLE': True,
     'QYWX_KEY': '',  # WeChat Work webhook key
     'TG_BOT_TOKEN': '',  # Telegram bot API token
-    'TG_USER_ID': ''  # Telegram user ID
+    'TG_USER_ID': '',  # Telegram user ID
+    'NOTIFY_TIMEOUT': 10,  # Default per-channel request timeout (seconds)
+    'TG_TIMEOUT': '',  # Telegram timeout, falls back to NOTIFY_TIMEOUT
+    'QYWX_TIMEOUT': '',  # WeChat Work timeout, falls back to NOTIFY_TIMEOUT
+    'NOTIFY_RETRIES': 2,  # Retries per channel after the first attempt
+    'NOTIFY_BACKOFF': 1,  # Initial retry backoff (seconds), doubled on each retry
+    'NOTIFY_FLUSH_TIMEOUT': 30,  # Max seconds to wait for background delivery at exit
+    'HITOKOTO_WAIT': 2,  # Max seconds to wait for a prefetched Hitokoto sentence
+    'HITOKOTO_CACHE': '.leaflow_state/hitokoto.json',  # Last fetched sentence, used as fallback
+    'TG_MAX_LENGTH': 4096,  # Telegram message limit (characters); longer content is split
+    'QYWX_MAX_BYTES': 2048,  # WeChat Work text message limit (UTF-8 bytes); longer content is split
+    'NOTIFY_MAX_ACCOUNTS': 20,  # Max failing / expiring accounts listed by name in a check-in digest
 }
 
 # Load configuration from environment variables
@@ -30,6 +44,110 @@ for k in push_config:
     if os.getenv(k):
         push_config[k] = os.getenv(k)
 
+_session = None
+_session_lock = threading.Lock()
+_pending = []
+_pending_lock = threading.Lock()
+_hitokoto_thread = None
+_hitokoto_result = {}
+
+
+def _config_number(key: str, default: float) -> float:
+    """Read a numeric option (environment values are strings)."""
+    try:
+        value = push_config.get(key)
+        return float(value) if value not in (None, '') else default
+    except (TypeError, ValueError):
+        return default
+
+
+def get_session() -> requests.Session:
+    """
+    Shared pooled HTTP client for all notification channels.
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=8)
+            _session.mount('https://', adapter)
+            _session.mount('http://', adapter)
+        return _session
+
+
+def _post_with_retry(channel: str, timeout_key: str, **kwargs) -> requests.Response:
+    """
+    POST with a per-channel timeout and exponential backoff between retries.
+    """
+    timeout = _config_number(timeout_key, _config_number('NOTIFY_TIMEOUT', 10))
+    retries = int(_config_number('NOTIFY_RETRIES', 2))
+    backoff = _config_number('NOTIFY_BACKOFF', 1)
+
+    for attempt in range(retries + 1):
+        try:
+            response = get_session().post(timeout=timeout, **kwargs)
+            if response.status_code < 500 and response.status_code != 429:
+                return response
+            error = f"HTTP {response.status_code}"
+        except requests.RequestException as e:
+            error = str(e)
+
+        if attempt < retries:
+            delay = backoff * (2 ** attempt)
+            print(f"{channel} push attempt {attempt + 1} failed ({error}), retrying in {delay:g}s")
+            time.sleep(delay)
+
+    raise RuntimeError(f"{channel} push failed after {retries + 1} attempts: {error}")
+
+
+def _utf8_size(text: str) -> int:
+    return len(text.encode('utf-8'))
+
+
+def _split_line(line: str, budget: int, measure) -> list:
+    """Cut a line that does not fit in one message, without breaking characters."""
+    pieces = []
+    piece = ''
+    size = 0
+    for char in line:
+        char_size = measure(char)
+        if piece and size + char_size > budget:
+            pieces.append(piece)
+            piece, size = '', 0
+        piece += char
+        size += char_size
+    pieces.append(piece)
+    return pieces
+
+
+def split_message(title: str, content: str, limit: int, measure=len) -> list:
+    """
+    Split title + content into messages no longer than limit (as measured), breaking at line boundaries.
+    Continuation messages repeat the title with a (i/n) counter.
+    """
+    text = f"{title}\n\n{content}"
+    if measure(text) <= limit:
+        return [text]
+
+    # Room for the title and counter on every message
+    budget = max(1, limit - measure(f"{title} (99/99)\n\n"))
+    chunks = []
+    current = []
+    size = 0
+    for line in content.split("\n"):
+        for piece in _split_line(line, budget, measure) if measure(line) > budget else [line]:
+            piece_size = measure(piece)
+            if current and size + 1 + piece_size > budget:
+                chunks.append("\n".join(current))
+                current, size = [], 0
+            size += piece_size + (1 if current else 0)
+            current.append(piece)
+    if current:
+        chunks.append("\n".join(current))
+
+    return [f"{title} ({i}/{len(chunks)})\n\n{chunk}" for i, chunk in enumerate(chunks, 1)]
+
+
 def telegram_bot(title: str, content: str) -> None:
     """
     Send notification via Telegram bot.
@@ -44,22 +162,25 @@ def telegram_bot(title: str, content: str) -> None:
         return
     
     url = f"https://api.telegram.org/bot{token}/sendMessage"
-    data = {
-        "chat_id": chat_id,
-        "text": f"{title}\n\n{content}",
-        "disable_web_page_preview": True
-    }
+    messages = split_message(title, content, int(_config_number("TG_MAX_LENGTH", 4096)))
     
-    try:
-        response = requests.post(url=url, data=data, timeout=30)
-        result = response.json()
+    for text in messages:
+        data = {
+            "chat_id": chat_id,
+            "text": text,
+            "disable_web_page_preview": True
+        }
         
-        if result.get("ok"):
-            print("Telegram bot push successful!")
-        else:
-            print(f"Telegram bot push failed! Error: {result.get('description')}")
-    except Exception as e:
-        print(f"Telegram bot push exception: {e}")
+        try:
+            response = _post_with_retry("Telegram bot", "TG_TIMEOUT", url=url, data=data)
+            result = response.json()
+            
+            if result.get("ok"):
+                print("Telegram bot push successful!")
+            else:
+                print(f"Telegram bot push failed! Error: {result.get('description')}")
+        except Exception as e:
+            print(f"Telegram bot push exception: {e}")
 
 def wecom_bot(title: str, content: str) -> None:
     """
@@ -74,19 +195,22 @@ def wecom_bot(title: str, content: str) -> None:
     
     url = f"https://qyapi.weixin.qq.com/cgi-bin/webhook/send?key={key}"
     headers = {"Content-Type": "application/json;charset=utf-8"}
-    data = {"msgtype": "text", "text": {"content": f"{title}\n\n{content}"}}
+    messages = split_message(title, content, int(_config_number("QYWX_MAX_BYTES", 2048)), _utf8_size)
     
-    try:
-        response = requests.post(
-            url=url, data=json.dumps(data), headers=headers, timeout=15
-        ).json()
+    for text in messages:
+        data = {"msgtype": "text", "text": {"content": text}}
+        
+        try:
+            response = _post_with_retry(
+                "WeChat Work bot", "QYWX_TIMEOUT", url=url, data=json.dumps(data), headers=headers
+            ).json()
 
-        if response.get("errcode") == 0:
-            print("WeChat Work bot push successful!")
-        else:
-            print(f"WeChat Work bot push failed! Error code: {response.get('errcode')}, Error message: {response.get('errmsg')}")
-    except Exception as e:
-        print(f"WeChat Work bot push exception: {e}")
+            if response.get("errcode") == 0:
+                print("WeChat Work bot push successful!")
+            else:
+                print(f"WeChat Work bot push failed! Error code: {response.get('errcode')}, Error message: {response.get('errmsg')}")
+        except Exception as e:
+            print(f"WeChat Work bot push exception: {e}")
 
 def one() -> str:
     """
@@ -94,12 +218,58 @@ def one() -> str:
     """
     url = "https://v1.hitokoto.cn/"
     try:
-        res = requests.get(url, timeout=10).json()
+        res = get_session().get(url, timeout=10).json()
         return res["hitokoto"] + "    ----" + res["from"]
     except Exception as e:
         print(f"Hitokoto fetch failed: {e}")
         return "Hitokoto fetch failed"
 
+
+def _fetch_hitokoto() -> None:
+    sentence = one()
+    if sentence != "Hitokoto fetch failed":
+        _hitokoto_result['sentence'] = sentence
+        try:
+            cache_file = push_config.get("HITOKOTO_CACHE")
+            if cache_file:
+                os.makedirs(os.path.dirname(os.path.abspath(cache_file)), exist_ok=True)
+                with open(cache_file, 'w', encoding='utf-8') as f:
+                    json.dump({'sentence': sentence, 'fetched_at': time.time()}, f, ensure_ascii=False)
+        except OSError:
+            pass
+
+
+def prefetch_hitokoto() -> None:
+    """
+    Start fetching a Hitokoto sentence in the background so send() does not wait for it.
+    """
+    global _hitokoto_thread
+    if _hitokoto_thread is None:
+        _hitokoto_thread = threading.Thread(target=_fetch_hitokoto, name="hitokoto", daemon=True)
+        _hitokoto_thread.start()
+
+
+def cached_hitokoto() -> str:
+    """
+    Hitokoto sentence from the prefetch, falling back to the last cached one.
+    """
+    global _hitokoto_thread
+    prefetch_hitokoto()
+    thread = _hitokoto_thread
+    thread.join(_config_number("HITOKOTO_WAIT", 2))
+    if not thread.is_alive():
+        # Consumed: the next send() in a long-running process fetches a fresh sentence
+        _hitokoto_thread = None
+        sentence = _hitokoto_result.pop('sentence', None)
+        if sentence:
+            return sentence
+
+    try:
+        with open(push_config.get("HITOKOTO_CACHE") or '', 'r', encoding='utf-8') as f:
+            return json.load(f)['sentence']
+    except (OSError, ValueError, KeyError, TypeError):
+        return ""
+
 def console(title: str, content: str) -> None:
     """
     Print notification to console.
@@ -121,7 +291,32 @@ def add_notify_function():
 
     return notify_function
 
-def send(title: str, content: str, ignore_default_config: bool = False, **kwargs):
+def _deliver(title: str, content: str) -> None:
+    # Add Hitokoto
+    hitokoto = push_config.get("HITOKOTO")
+    if hitokoto and hitokoto != "false":
+        sentence = cached_hitokoto()
+        if sentence:
+            content += "\n\n" + sentence
+
+    # Execute notification functions
+    notify_function = add_notify_function()
+    
+    ts = [
+        threading.Thread(target=mode, args=(title, content), name=mode.__name__)
+        for mode in notify_function
+    ]
+    [t.start() for t in ts]
+    [t.join() for t in ts]
+
+
+def send(title: str, content: str, ignore_default_config: bool = False, background: bool = False, **kwargs):
+    """
+    Send a notification through all configured channels.
+
+    With background=True the call returns immediately; delivery continues in a
+    background thread and is flushed (bounded by NOTIFY_FLUSH_TIMEOUT) at exit.
+    """
     if kwargs:
         global push_config
         if ignore_default_config:
@@ -140,20 +335,41 @@ def send(title: str, content: str, ignore_default_config: bool = False, **kwargs
             print(f"{title} is in SKIP_PUSH_TITLE environment variable, skipping push!")
             return
 
-    # Add Hitokoto
-    hitokoto = push_config.get("HITOKOTO")
-    if hitokoto and hitokoto != "false":
-        content += "\n\n" + one()
+    if not background:
+        _deliver(title, content)
+        return None
 
-    # Execute notification functions
-    notify_function = add_notify_function()
-    
-    ts = [
-        threading.Thread(target=mode, args=(title, content), name=mode.__name__)
-        for mode in notify_function
-    ]
-    [t.start() for t in ts]
-    [t.join() for t in ts]
+    t = threading.Thread(target=_deliver, args=(title, content), name="notify-dispatch", daemon=True)
+    with _pending_lock:
+        # Drop deliveries that already finished so long-running processes don't accumulate threads
+        _pending[:] = [p for p in _pending if p.is_alive()]
+        t.start()
+        _pending.append(t)
+    return t
+
+
+def flush(timeout: float = None) -> bool:
+    """
+    Wait for background deliveries to finish. Returns False if the timeout expired first.
+    """
+    if timeout is None:
+        timeout = _config_number("NOTIFY_FLUSH_TIMEOUT", 30)
+    deadline = time.monotonic() + timeout
+
+    with _pending_lock:
+        pending = list(_pending)
+    for t in pending:
+        t.join(max(0, deadline - time.monotonic()))
+
+    with _pending_lock:
+        _pending[:] = [t for t in _pending if t.is_alive()]
+        unfinished = len(_pending)
+    if unfinished:
+        print(f"{unfinished} notification(s) still pending after {timeout:g}s, giving up")
+    return unfinished == 0
+
+
+atexit.register(flush)
 
 def main():
     print("Starting test notification...")
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+LeafLow notification digest
+签到结果通知摘要
+
+逐条读取签到结果，按状态和失败原因分组计数，只列出失败（及 Cookie 即将过期）的账号且数量有上限，
+通知内容的长度和生成时间不随账号数量增长；超出渠道长度限制的部分由 notify 模块拆分为多条消息发送。
+"""
+
+import re
+
+from state_store import format_timestamp
+
+# 去掉原因中的可变部分（异常详情、端点数量、奖励数额等）
+REASON_SPLIT = re.compile(r'[:(!]')
+
+
+def failure_reason(result):
+    """结果消息归类后的原因，例如 "Authentication failed"、"All checkin methods failed" """
+    if result.get('timed_out'):
+        return 'Time budget exceeded'
+    message = str(result.get('message') or '').strip()
+    reason = REASON_SPLIT.split(message, 1)[0].strip()
+    return reason or 'Unknown'
+
+
+def result_icon(result):
+    if result['success']:
+        return "✅"
+    return "⏰" if result.get('timed_out') else "❌"
+
+
+class NotificationDigest:
+    """流式汇总签到结果：add() 逐条登记，render() 生成通知正文"""
+
+    def __init__(self, max_accounts=20):
+        self.max_accounts = max(0, int(max_accounts))
+        self.total = 0
+        self.successful = 0
+        self.timed_out = 0
+        self.successes = {}
+        self.failures = {}
+        self.failed_accounts = []
+        self.expiring = 0
+        self.expiring_accounts = []
+
+    def add(self, result):
+        self.total += 1
+        reason = failure_reason(result)
+        if result['success']:
+            self.successful += 1
+            self.successes[reason] = self.successes.get(reason, 0) + 1
+        else:
+            if result.get('timed_out'):
+                self.timed_out += 1
+            self.failures[reason] = self.failures.get(reason, 0) + 1
+            if len(self.failed_accounts) < self.max_accounts:
+                self.failed_accounts.append(f"{result_icon(result)} {result['account']}: {result['message']}")
+
+        if result.get('token_status') == 'expiring':
+            self.expiring += 1
+            if len(self.expiring_accounts) < self.max_accounts:
+                self.expiring_accounts.append(f"  {result['account']}: {format_timestamp(result.get('expires_at'))}")
+
+    def extend(self, results):
+        for result in results:
+            self.add(result)
+        return self
+
+    def render(self):
+        summary = f"Token check-in completed: {self.successful}/{self.total} successful"
+        if self.timed_out:
+            summary += f", {self.timed_out} out of time budget"
+        lines = [summary]
+
+        for icon, label, groups in (("✅", "Succeeded", self.successes), ("❌", "Failed", self.failures)):
+            if not groups:
+                continue
+            lines.append(f"\n{icon} {label} ({sum(groups.values())}):")
+            for reason, count in sorted(groups.items(), key=lambda item: (-item[1], item[0])):
+                lines.append(f"  {reason}: {count}")
+
+        failed = self.total - self.successful
+        if self.failed_accounts:
+            lines.append(_heading("Failed accounts", len(self.failed_accounts), failed))
+            lines.extend(self.failed_accounts)
+            if failed > len(self.failed_accounts):
+                lines.append(f"  … and {failed - len(self.failed_accounts)} more")
+
+        # 提前提醒即将过期的 Cookie
+        if self.expiring:
+            lines.append(_heading("⌛ Cookies expiring soon", len(self.expiring_accounts), self.expiring))
+            lines.extend(self.expiring_accounts)
+            if self.expiring > len(self.expiring_accounts):
+                lines.append(f"  … and {self.expiring - len(self.expiring_accounts)} more")
+
+        return "\n".join(lines)
+
+
+def _heading(label, shown, total):
+    if shown < total:
+        return f"\n{label} (showing {shown} of {total}):"
+    return f"\n{label} ({total}):"
+
+
+def build_digest(results, max_accounts=20):
+    """遍历一次结果（列表或结果文件）生成通知正文"""
+    return NotificationDigest(max_accounts).extend(results).render()
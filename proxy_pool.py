@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+LeafLow egress proxy pool
+出口代理池
+
+账号可以在配置中单独指定 proxy，也可以从 settings.proxies 代理池中分配。
+分配是粘性的：账号每次运行都使用同一个代理（分配记录保存在 state_dir），
+只有代理从池中移除或健康度过低时才重新分配。
+每个代理按请求结果维护健康度和延迟（指数滑动平均），新的分配优先选择健康、快速且负载较低的代理。
+"""
+
+import hashlib
+import threading
+from urllib.parse import urlsplit
+
+
+def proxy_label(url):
+    """用于日志和结果的代理名称：去掉用户名和密码"""
+    if not url:
+        return None
+    parts = urlsplit(url)
+    host = parts.hostname or ''
+    if parts.port:
+        host = f"{host}:{parts.port}"
+    return f"{parts.scheme}://{host}" if parts.scheme else host
+
+
+def proxy_id(url):
+    """保存在状态文件中的代理标识（不包含凭据）"""
+    return hashlib.sha1(url.encode('utf-8')).hexdigest()[:12]
+
+
+def is_proxy_failure(record):
+    """连接错误、超时或代理认证失败视为代理故障；站点返回的错误状态码不算"""
+    return record.error is not None or record.status == 407
+
+
+class ProxyStats:
+    """单个代理的健康度（0~1）与延迟（秒）"""
+
+    def __init__(self, url):
+        self.url = url
+        self.id = proxy_id(url)
+        self.label = proxy_label(url)
+        self.health = 1.0
+        self.latency = None
+        self.reset_run_stats()
+
+    def reset_run_stats(self):
+        self.accounts = 0
+        self.requests = 0
+        self.failures = 0
+
+    def record(self, ok, elapsed, alpha):
+        self.requests += 1
+        self.health = (1 - alpha) * self.health + alpha * (1.0 if ok else 0.0)
+        if ok:
+            self.latency = elapsed if self.latency is None else (1 - alpha) * self.latency + alpha * elapsed
+        else:
+            self.failures += 1
+
+    def score(self):
+        """分配时的得分：健康度越高、延迟越低、本次运行已分配的账号越少越好"""
+        latency = self.latency if self.latency is not None else 0.0
+        return self.health / (1.0 + latency) / (1.0 + self.accounts)
+
+    def to_dict(self):
+        return {
+            'proxy': self.label,
+            'accounts': self.accounts,
+            'requests': self.requests,
+            'failures': self.failures,
+            'health': round(self.health, 3),
+            'latency_ms': round(self.latency * 1000, 1) if self.latency is not None else None,
+        }
+
+
+class ProxyPool:
+    """代理池：粘性分配与健康度统计，state 为可选的 JsonStateFile，保存 账号标识 -> 代理标识"""
+
+    def __init__(self, proxies, state=None, min_health=0.5, alpha=0.2, logger=None):
+        self.proxies = [ProxyStats(url) for url in dict.fromkeys(proxies)]
+        self.by_url = {proxy.url: proxy for proxy in self.proxies}
+        self.by_id = {proxy.id: proxy for proxy in self.proxies}
+        self.state = state
+        self.min_health = min_health
+        self.alpha = alpha
+        self.logger = logger
+        self.lock = threading.Lock()
+        self.assignments = {}
+        if state is not None:
+            with state.lock:
+                self.assignments = dict(state.data)
+
+    def assign(self, account_key, account_name=None):
+        """返回账号使用的代理 URL：沿用已有分配，代理不可用时改为得分最高的代理"""
+        with self.lock:
+            current = self.by_id.get(self.assignments.get(account_key))
+            proxy = current
+            if proxy is None or proxy.health < self.min_health:
+                best = max(self.proxies, key=lambda candidate: candidate.score())
+                if proxy is None or best.health > proxy.health:
+                    proxy = best
+            proxy.accounts += 1
+            if proxy is not current:
+                self.assignments[account_key] = proxy.id
+                if self.state is not None:
+                    with self.state.lock:
+                        self.state.data[account_key] = proxy.id
+                        self.state.mark_changed(account_key)
+
+        if current is not None and proxy is not current and self.logger is not None:
+            self.logger.warning(
+                "🌐 [%s] Proxy %s is unhealthy (health %.2f), moving to %s",
+                account_name or account_key, current.label, current.health, proxy.label,
+            )
+        return proxy.url
+
+    def record(self, url, records):
+        """登记一个账号通过该代理发出的全部请求（RequestRecord）"""
+        proxy = self.by_url.get(url)
+        if proxy is None:
+            return
+        with self.lock:
+            for record in records:
+                proxy.record(not is_proxy_failure(record), record.elapsed, self.alpha)
+
+    def start_run(self):
+        """新一次运行开始：保留健康度和延迟，重置本次运行的计数"""
+        with self.lock:
+            for proxy in self.proxies:
+                proxy.reset_run_stats()
+
+    def snapshot(self):
+        with self.lock:
+            return [proxy.to_dict() for proxy in self.proxies]
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+LeafLow adaptive rate control
+按主机的自适应限速
+
+每个主机一个令牌桶，由所有账号共享，每个请求发送前先取得令牌。
+服务器正常响应时速率按加法缓慢提高，遇到 429 / 5xx 或请求超时时按乘法降低（AIMD）；
+响应带 Retry-After 时，在指定时间内暂停向该主机发送请求。
+经代理发出的请求按 (主机, 代理) 分别限速，站点按出口 IP 限流时各代理互不影响。
+代替账号之间固定的 retry_delay 等待：站点健康时尽量快，站点吃紧时自动退让。
+"""
+
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+
+from proxy_pool import proxy_label
+
+
+def rate_key(url, via=None):
+    """限速的粒度：主机，经代理时为 主机 + 代理"""
+    host = urlsplit(url).netloc
+    return f"{host} via {proxy_label(via)}" if via else host
+
+
+def is_throttle_status(status):
+    """服务器过载或限流的响应"""
+    return status == 429 or status >= 500
+
+
+def parse_retry_after(value, now=None):
+    """解析 Retry-After（秒数或 HTTP 日期），返回需要等待的秒数，无法解析时返回 None"""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError, IndexError):
+        return None
+    if retry_at is None:
+        return None
+    return max(0.0, retry_at.timestamp() - (now if now is not None else time.time()))
+
+
+class HostRateLimiter:
+    """单个主机的令牌桶，速率按 AIMD 调整（调用方持有锁）"""
+
+    def __init__(self, rate, min_rate, max_rate, burst, increase, decrease):
+        self.rate = rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.burst = burst
+        self.increase = increase
+        self.decrease = decrease
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.last_decrease = 0.0
+        self.reset_run_stats()
+
+    def reset_run_stats(self):
+        self.peak_rate = self.rate
+        self.requests = 0
+        self.throttled = 0
+        self.waited = 0.0
+
+    def reserve(self, now):
+        """取走一个令牌，返回需要等待的秒数（令牌不足时记为欠额，后续请求依次排队）"""
+        self.tokens = min(self.burst, self.tokens + max(0.0, now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= 1
+        wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+        wait = max(wait, self.blocked_until - now)
+        self.requests += 1
+        self.waited += wait
+        return wait
+
+    def on_success(self, now):
+        # 每个成功请求增加 increase / rate，相当于每秒提高 increase 个请求
+        self.rate = min(self.max_rate, self.rate + self.increase / self.rate)
+        self.peak_rate = max(self.peak_rate, self.rate)
+
+    def on_throttle(self, now, retry_after=None):
+        """返回是否降低了速率；并发中的请求同时失败时，每秒最多降低一次"""
+        self.throttled += 1
+        if retry_after:
+            self.blocked_until = max(self.blocked_until, now + retry_after)
+            self.tokens = min(self.tokens, 0.0)
+        if now - self.last_decrease < 1.0:
+            return False
+        self.last_decrease = now
+        self.rate = max(self.min_rate, self.rate * self.decrease)
+        return True
+
+    def to_dict(self, host):
+        return {
+            'host': host,
+            'rate': round(self.rate, 3),
+            'peak_rate': round(self.peak_rate, 3),
+            'requests': self.requests,
+            'throttled': self.throttled,
+            'waited': round(self.waited, 3),
+        }
+
+
+class RateController:
+    """按主机管理令牌桶，所有账号的请求都经过这里"""
+
+    def __init__(self, initial_rate=2.0, min_rate=0.2, max_rate=20.0, burst=5,
+                 increase=0.5, decrease=0.5, max_retry_after=300, logger=None):
+        self.initial_rate = initial_rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.burst = burst
+        self.increase = increase
+        self.decrease = decrease
+        self.max_retry_after = max_retry_after
+        self.logger = logger
+        self.lock = threading.Lock()
+        self.limiters = {}
+
+    def limiter(self, host):
+        """获取主机的令牌桶（调用方需持有 self.lock）"""
+        limiter = self.limiters.get(host)
+        if limiter is None:
+            limiter = self.limiters[host] = HostRateLimiter(
+                self.initial_rate, self.min_rate, self.max_rate, self.burst, self.increase, self.decrease,
+            )
+        return limiter
+
+    def acquire(self, url, max_wait=None, via=None):
+        """等待直到允许向 url 所在主机发送请求；max_wait 为最长等待时间（账号剩余的时间预算），via 为使用的代理"""
+        with self.lock:
+            wait = self.limiter(rate_key(url, via)).reserve(time.monotonic())
+        if max_wait is not None:
+            wait = min(wait, max(0.0, max_wait))
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    def observe(self, url, status, retry_after=None, via=None):
+        """根据响应状态码和 Retry-After 调整主机速率"""
+        host = rate_key(url, via)
+        delay = parse_retry_after(retry_after) if status == 429 or status == 503 else None
+        if delay is not None:
+            delay = min(delay, self.max_retry_after)
+
+        if not is_throttle_status(status):
+            with self.lock:
+                self.limiter(host).on_success(time.monotonic())
+            return
+        self.throttle(host, f"answered {status}", delay)
+
+    def observe_timeout(self, url, via=None):
+        """请求超时同样视为过载信号"""
+        self.throttle(rate_key(url, via), "timed out")
+
+    def throttle(self, host, reason, delay=None):
+        with self.lock:
+            limiter = self.limiter(host)
+            decreased = limiter.on_throttle(time.monotonic(), delay)
+            rate = limiter.rate
+
+        if self.logger is not None and (decreased or delay):
+            if delay:
+                self.logger.warning(
+                    "🚦 %s %s, pausing for %.1fs and slowing down to %.2f req/s", host, reason, delay, rate,
+                )
+            else:
+                self.logger.warning("🚦 %s %s, slowing down to %.2f req/s", host, reason, rate)
+
+    def start_run(self):
+        """新一次运行开始：保留已学到的速率，重置峰值和计数"""
+        with self.lock:
+            for limiter in self.limiters.values():
+                limiter.reset_run_stats()
+
+    def snapshot(self):
+        """每个主机当前速率、本次运行的峰值速率和限流次数"""
+        with self.lock:
+            return [limiter.to_dict(host) for host, limiter in sorted(self.limiters.items())]
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+LeafLow result sink
+签到结果的流式写入
+
+每个账号处理完成后立即把结果追加到 JSONL 或 CSV 文件并刷新到磁盘，
+运行中途崩溃时已完成账号的结果不会丢失，内存占用也不随账号数量增长。
+运行结束时的汇总和通知通过逐条读取该文件生成。
+"""
+
+import csv
+import json
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+
+FIELDS = (
+    'account', 'index', 'success', 'message', 'requests', 'duration',
+    'timed_out', 'bytes', 'proxy', 'token_status', 'expires_at',
+)
+
+
+def _parse_bool(value):
+    return value == 'True'
+
+
+def _parse_optional(convert):
+    def parse(value):
+        return convert(value) if value not in ('', None) else None
+    return parse
+
+
+# CSV 中读回的字段类型
+CSV_TYPES = {
+    'index': _parse_optional(int),
+    'success': _parse_bool,
+    'requests': int,
+    'duration': float,
+    'timed_out': _parse_bool,
+    'bytes': int,
+    'proxy': _parse_optional(str),
+    'token_status': _parse_optional(str),
+    'expires_at': _parse_optional(float),
+}
+
+
+class ResultSink(ABC):
+    """追加写入的结果文件，同时累计成功数、请求数等计数；可以多次遍历读回全部结果
+
+    append 为 True 时接在已有结果之后写入；计数和遍历都只包含本次写入的结果，完整文件用 read_result_file 读取。
+    """
+
+    def __init__(self, path, fsync_interval=1.0, append=False):
+        self.path = path
+        self.fsync_interval = fsync_interval
+        self.lock = threading.Lock()
+        self.total = 0
+        self.successful = 0
+        self.requests = 0
+        self.timed_out = 0
+        self.last = None
+        self.last_sync = 0.0
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        # 默认每次运行重新开始写入
+        self.file = open(path, 'a' if append else 'w', encoding='utf-8', newline='')
+        self.offset = self.file.tell()
+        self.start()
+
+    def start(self):
+        """写入文件头（CSV 表头）；追加到已有文件时不重复写入"""
+
+    @abstractmethod
+    def write(self, result):
+        """把一条结果写入 self.file"""
+
+    def append(self, result):
+        """写入一个账号的结果并刷新；fsync 每 fsync_interval 秒最多一次"""
+        with self.lock:
+            self.write(result)
+            self.file.flush()
+            now = time.monotonic()
+            if now - self.last_sync >= self.fsync_interval:
+                os.fsync(self.file.fileno())
+                self.last_sync = now
+
+            self.total += 1
+            self.successful += 1 if result.get('success') else 0
+            self.requests += result.get('requests') or 0
+            self.timed_out += 1 if result.get('timed_out') else 0
+            self.last = result
+
+    def close(self):
+        with self.lock:
+            if not self.file.closed:
+                self.file.flush()
+                os.fsync(self.file.fileno())
+                self.file.close()
+
+    def __len__(self):
+        return self.total
+
+    def __iter__(self):
+        """按写入顺序逐条读回结果"""
+        with self.lock:
+            if not self.file.closed:
+                self.file.flush()
+        with open(self.path, 'r', encoding='utf-8', newline='') as f:
+            f.seek(self.offset)
+            yield from self.read(f)
+
+    @staticmethod
+    @abstractmethod
+    def read(f):
+        """从已打开的文件中逐条解析结果"""
+
+
+class JsonlResultSink(ResultSink):
+    """每行一个 JSON 对象"""
+
+    def write(self, result):
+        self.file.write(json.dumps(result, ensure_ascii=False) + '\n')
+
+    @staticmethod
+    def read(f):
+        for line in f:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+
+class CsvResultSink(ResultSink):
+    """CSV，列固定为 FIELDS"""
+
+    def start(self):
+        self.writer = csv.DictWriter(self.file, fieldnames=FIELDS, extrasaction='ignore')
+        if not self.file.tell():
+            self.writer.writeheader()
+
+    def write(self, result):
+        self.writer.writerow(result)
+
+    @staticmethod
+    def read(f):
+        # 从文件中间（追加写入的位置）开始读取时没有表头
+        reader = csv.DictReader(f) if not f.tell() else csv.DictReader(f, fieldnames=FIELDS)
+        for row in reader:
+            yield {
+                name: CSV_TYPES[name](value) if name in CSV_TYPES else value
+                for name, value in row.items()
+            }
+
+
+def result_sink_class(path):
+    """按扩展名选择格式：.csv 为 CSV，其余为 JSONL"""
+    return CsvResultSink if path.lower().endswith('.csv') else JsonlResultSink
+
+
+def open_result_sink(path, append=False):
+    return result_sink_class(path)(path, append=append)
+
+
+def read_result_file(path):
+    """逐条读取结果文件中的全部结果；文件不存在时为空"""
+    try:
+        f = open(path, 'r', encoding='utf-8', newline='')
+    except FileNotFoundError:
+        return
+    with f:
+        yield from result_sink_class(path).read(f)
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+LeafLow check-in daemon
+常驻调度模式
+
+进程常驻运行，每个账号按各自的每日签到时间（加随机抖动）执行，
+连接池和轮换后的 Cookie 在多次签到之间保持在内存中；
+签到失败的账号按指数退避在当天重试，配置文件修改后自动重新加载。
+每批结果追加到当天的结果文件，当天的账号全部处理完后只发送一次汇总通知。
+"""
+
+import os
+import random
+import signal
+import threading
+from datetime import datetime, timedelta
+
+from result_sink import read_result_file
+
+
+class CheckinDaemon:
+    """按账号调度每日签到"""
+
+    def __init__(self, checkin, on_results=None, poll_interval=30):
+        """on_results(成功数, 总数, 结果) 每天调用一次，结果为当天每个账号最后一次的签到结果"""
+        self.checkin = checkin
+        self.on_results = on_results
+        self.poll_interval = poll_interval
+        self.stop_event = threading.Event()
+        self.completed = {}
+        # 今天签到失败的账号：account_key -> (日期, 已重试次数, 下次重试时间)
+        self.retries = {}
+        # 已有签到结果、尚未发送汇总的日期
+        self.digest_day = None
+        self.config_mtime = self.get_config_mtime()
+
+    @property
+    def logger(self):
+        return self.checkin.logger
+
+    def get_config_mtime(self):
+        try:
+            return os.path.getmtime(self.checkin.config_file)
+        except OSError:
+            return None
+
+    def reload_if_changed(self):
+        """配置文件修改后重新加载"""
+        mtime = self.get_config_mtime()
+        if mtime is None or mtime == self.config_mtime:
+            return
+        self.config_mtime = mtime
+        if self.checkin.reload_config():
+            self.logger.info("🔄 Reloaded %s", self.checkin.config_file)
+
+    def due_time(self, account, account_key, day):
+        """账号在指定日期的签到时间：账号 checkin_time 或 settings.daily_time，加上按账号和日期固定的随机抖动"""
+        settings = self.checkin.config['settings']
+        daily_time = account.get('checkin_time') or settings.get('daily_time', '08:30')
+        try:
+            hour, minute = (int(part) for part in str(daily_time).split(':')[:2])
+        except ValueError:
+            self.logger.warning("⚠️ Invalid checkin time '%s', using 08:30", daily_time)
+            hour, minute = 8, 30
+
+        jitter = float(settings.get('schedule_jitter', 1800))
+        # 以账号和日期为种子，重启后同一天的签到时间不变
+        offset = random.Random(f"{account_key}:{day.isoformat()}").uniform(0, jitter) if jitter > 0 else 0
+        return datetime(day.year, day.month, day.day, hour, minute) + timedelta(seconds=offset)
+
+    def collect_due(self, now):
+        """返回已到签到时间且今天尚未处理的账号序号，以及下一个账号的签到时间"""
+        today = now.date()
+        due = []
+        next_due = None
+        for account_index, account, account_name in self.checkin.iter_enabled_accounts(log_skipped=False):
+            account_key = self.checkin.get_account_key(account, account_name)
+            if self.completed.get(account_key) == today:
+                continue
+            journal = self.checkin.journal
+            if journal is not None and not self.checkin.force_rerun and journal.completed(account_key, today):
+                # 重启前今天已签到成功
+                self.completed[account_key] = today
+                continue
+            retry = self.retries.get(account_key)
+            if retry is not None and retry[0] == today:
+                due_at = retry[2]
+            else:
+                due_at = self.due_time(account, account_key, today)
+            if due_at <= now:
+                due.append((account_index, account_key))
+            elif next_due is None or due_at < next_due:
+                next_due = due_at
+        return due, next_due
+
+    def run_once(self, now):
+        """处理当前到期的账号，返回距离下一次检查的秒数"""
+        self.reload_if_changed()
+        due, next_due = self.collect_due(now)
+
+        today = now.date()
+        if due:
+            _, _, results = self.checkin.run_all_accounts(
+                account_indexes={account_index for account_index, _ in due}, day=today,
+            )
+            succeeded = {result['index'] for result in results if result['success']}
+            for account_index, account_key in due:
+                if account_index in succeeded:
+                    self.completed[account_key] = today
+                    self.retries.pop(account_key, None)
+                else:
+                    # 退避从本次签到结束时算起
+                    retry_at = self.schedule_retry(account_key, today, max(now, datetime.now()))
+                    if retry_at is not None and (next_due is None or retry_at < next_due):
+                        next_due = retry_at
+            self.digest_day = today
+
+        # 当天的账号全部处理完（或已经过了零点）后发送当天的汇总
+        if self.digest_day is not None and (self.digest_day != today or self.day_finished(today)):
+            self.send_digest(self.digest_day)
+
+        wait = self.poll_interval
+        if next_due is not None:
+            wait = min(wait, max(0.0, (next_due - datetime.now()).total_seconds()))
+        return wait
+
+    def day_finished(self, day):
+        """所有启用的账号在 day 都已签到成功或放弃重试"""
+        return all(
+            self.completed.get(self.checkin.get_account_key(account, account_name)) == day
+            for _, account, account_name in self.checkin.iter_enabled_accounts(log_skipped=False)
+        )
+
+    def send_digest(self, day):
+        """读取 day 的结果文件，每个账号取最后一次的结果，调用 on_results"""
+        self.digest_day = None
+        if self.on_results is None:
+            return
+        latest = {}
+        for result in read_result_file(self.checkin.results_path(day)):
+            latest[result.get('index', result['account'])] = result
+        results = sorted(latest.values(), key=lambda result: (result.get('index') is None, result.get('index') or 0))
+        self.on_results(sum(1 for result in results if result['success']), len(results), results)
+
+    def schedule_retry(self, account_key, today, finished):
+        """签到失败的账号在 daemon_retry_delay 秒后重试，每次间隔翻倍；超过 daemon_max_retries 次后今天不再处理。返回下次重试时间"""
+        settings = self.checkin.config['settings']
+        retry_delay = float(settings.get('daemon_retry_delay', 600))
+        max_retries = int(settings.get('daemon_max_retries', 3))
+
+        previous = self.retries.get(account_key)
+        attempts = previous[1] + 1 if previous is not None and previous[0] == today else 1
+        if attempts > max_retries:
+            self.retries.pop(account_key, None)
+            self.completed[account_key] = today
+            self.logger.warning("⚠️ %s still failing after %s retries, giving up until tomorrow", account_key, max_retries)
+            return None
+
+        retry_at = finished + timedelta(seconds=retry_delay * 2 ** (attempts - 1))
+        self.retries[account_key] = (today, attempts, retry_at)
+        self.logger.info("🔁 %s failed, retry %s/%s at %s", account_key, attempts, max_retries, retry_at.strftime('%H:%M:%S'))
+        return retry_at
+
+    def stop(self, *_):
+        self.stop_event.set()
+
+    def run_forever(self):
+        """常驻运行，直到收到 SIGTERM / SIGINT"""
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            try:
+                signal.signal(signum, self.stop)
+            except ValueError:
+                # 非主线程无法注册信号处理
+                pass
+
+        self.logger.info("🕰️ Daemon mode started")
+        while not self.stop_event.is_set():
+            wait = self.run_once(datetime.now())
+            self.stop_event.wait(wait)
+        if self.digest_day is not None:
+            self.send_digest(self.digest_day)
+        self.checkin.save_state()
+        self.logger.info("🛑 Daemon mode stopped")
@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+LeafLow local state store
+本地状态文件（签到端点缓存、会话 Cookie 等）
+
+状态文件均为 JSON，写入时先写临时文件再 os.replace，
+保证中途崩溃也不会留下半个文件；写入前持有跨进程文件锁并合并磁盘上的最新内容，
+多个同时运行的进程不会互相覆盖。
+"""
+
+import contextlib
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+from account_source import is_remember_cookie
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    try:
+        import msvcrt
+    except ImportError:
+        msvcrt = None
+
+
+@contextlib.contextmanager
+def atomic_open(path):
+    """以流式方式原子写入文本文件：写入同目录临时文件，with 块正常结束后 os.replace 替换"""
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(
+        dir=directory, prefix=f".{os.path.basename(path)}.", suffix='.tmp'
+    )
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            yield f
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def atomic_write_text(path, text):
+    """原子写入文本文件：先写同目录临时文件，再 os.replace 替换"""
+    with atomic_open(path) as f:
+        f.write(text)
+
+
+def atomic_write_json(path, data):
+    """原子写入 JSON 文件"""
+    atomic_write_text(path, json.dumps(data, indent=2, ensure_ascii=False))
+
+
+class FileLock:
+    """跨进程文件锁（POSIX 使用 fcntl，Windows 使用 msvcrt）"""
+
+    def __init__(self, path):
+        self.path = f"{path}.lock"
+        self.handle = None
+
+    def __enter__(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self.handle = open(self.path, 'a+')
+        if fcntl is not None:
+            fcntl.flock(self.handle.fileno(), fcntl.LOCK_EX)
+        elif msvcrt is not None:
+            self.handle.seek(0)
+            msvcrt.locking(self.handle.fileno(), msvcrt.LK_LOCK, 1)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            if fcntl is not None:
+                fcntl.flock(self.handle.fileno(), fcntl.LOCK_UN)
+            elif msvcrt is not None:
+                self.handle.seek(0)
+                msvcrt.locking(self.handle.fileno(), msvcrt.LK_UNLCK, 1)
+        finally:
+            self.handle.close()
+            self.handle = None
+
+
+class JsonStateFile:
+    """加载到内存的 JSON 状态文件，按顶层键记录修改，调用 save() 合并落盘"""
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.changed = set()
+        self.removed = set()
+        self.last_save = 0
+        self.data = self.load()
+
+    @property
+    def dirty(self):
+        return bool(self.changed or self.removed)
+
+    def mark_changed(self, key):
+        """标记顶层键已修改（调用方需持有 self.lock）"""
+        self.removed.discard(key)
+        self.changed.add(key)
+
+    def mark_removed(self, key):
+        """标记顶层键已删除（调用方需持有 self.lock）"""
+        self.changed.discard(key)
+        self.removed.add(key)
+
+    def load(self):
+        """读取状态文件，文件不存在或损坏时返回空状态"""
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            return data if isinstance(data, dict) else {}
+        except (OSError, ValueError):
+            return {}
+
+    def save(self, min_interval=0):
+        """有修改时合并写回磁盘；min_interval 秒内已保存过则跳过"""
+        with self.lock:
+            if not self.dirty or time.time() - self.last_save < min_interval:
+                return
+            with FileLock(self.path):
+                # 合并其他进程在此期间写入的内容，只覆盖本进程修改过的键
+                merged = self.load()
+                for key in self.changed:
+                    merged[key] = self.data[key]
+                for key in self.removed:
+                    merged.pop(key, None)
+                atomic_write_json(self.path, merged)
+            self.data = merged
+            self.changed.clear()
+            self.removed.clear()
+            self.last_save = time.time()
+
+    def clear(self):
+        """清空状态并删除文件"""
+        with self.lock, FileLock(self.path):
+            self.data = {}
+            self.changed.clear()
+            self.removed.clear()
+            try:
+                os.remove(self.path)
+            except FileNotFoundError:
+                pass
+
+
+class EndpointCache(JsonStateFile):
+    """按账号、站点记录上次成功的签到端点和方法"""
+
+    def __init__(self, path, ttl=7 * 24 * 3600):
+        super().__init__(path)
+        self.ttl = ttl
+
+    def get(self, account_key, site):
+        """返回未过期的缓存条目 {'method', 'url', 'updated_at'}，没有则返回 None"""
+        with self.lock:
+            entry = self.data.get(account_key, {}).get(site)
+        if not entry:
+            return None
+        if time.time() - entry.get('updated_at', 0) > self.ttl:
+            return None
+        return entry
+
+    def remember(self, account_key, site, method, url):
+        """记录成功的端点"""
+        with self.lock:
+            self.data.setdefault(account_key, {})[site] = {
+                'method': method, 'url': url, 'updated_at': time.time(),
+            }
+            self.mark_changed(account_key)
+
+    def forget(self, account_key, site):
+        """删除失效的缓存条目"""
+        with self.lock:
+            if self.data.get(account_key, {}).pop(site, None) is not None:
+                if self.data[account_key]:
+                    self.mark_changed(account_key)
+                else:
+                    del self.data[account_key]
+                    self.mark_removed(account_key)
+
+
+def cookies_fingerprint(cookies):
+    """配置文件中 Cookie 的摘要，用于判断用户是否更新过配置"""
+    payload = json.dumps(cookies or {}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+
+class SessionStateStore(JsonStateFile):
+    """按账号保存服务器轮换后的 Cookie（leaflow_session / XSRF-TOKEN 等）"""
+
+    def load_cookies(self, account_key, fingerprint):
+        """返回该账号最新的 Cookie 列表；配置已更新或没有记录时返回 None"""
+        with self.lock:
+            entry = self.data.get(account_key)
+        if not entry or entry.get('fingerprint') != fingerprint:
+            return None
+        now = time.time()
+        return [
+            cookie for cookie in entry.get('cookies', [])
+            if not cookie.get('expires') or cookie['expires'] > now
+        ]
+
+    def store_cookies(self, account_key, fingerprint, cookie_jar):
+        """保存会话结束时的 Cookie；不同主机（leaflow.net / checkin.leaflow.net）下发的同名 Cookie 分别保存"""
+        cookies = {}
+        for cookie in cookie_jar:
+            cookies[(cookie.name, cookie.domain, cookie.path)] = {
+                'name': cookie.name,
+                'value': cookie.value,
+                'domain': cookie.domain,
+                'path': cookie.path,
+                'expires': cookie.expires,
+                'secure': cookie.secure,
+            }
+
+        with self.lock:
+            self.data[account_key] = {
+                'fingerprint': fingerprint,
+                'cookies': list(cookies.values()),
+                'updated_at': time.time(),
+            }
+            self.mark_changed(account_key)
+
+    def discard(self, account_key):
+        """删除账号记录（例如认证失败时退回使用配置文件中的 Cookie）"""
+        with self.lock:
+            if self.data.pop(account_key, None) is not None:
+                self.mark_removed(account_key)
+
+
+def session_cookie_expiry(cookie_jar):
+    """remember_web_* Cookie 中最晚的过期时间，全部失效后登录状态才会失效
+
+    leaflow_session 只有几个小时有效期且每次请求都会轮换，不参与判断；
+    没有 remember_web_* Cookie，或其中任何一个的过期时间未知（例如配置文件中设置、服务器没有重新下发的）时返回 None
+    """
+    cookies = [cookie for cookie in cookie_jar if is_remember_cookie(cookie.name)]
+    # 服务器重新下发过的 Cookie 取代配置文件中不带 domain 的同名旧值
+    reissued = {cookie.name for cookie in cookies if cookie.domain}
+    expiries = [cookie.expires for cookie in cookies if cookie.domain or cookie.name not in reissued]
+    if not expiries or not all(expiries):
+        return None
+    return max(expiries)
+
+
+def format_timestamp(timestamp):
+    """Unix 时间戳格式化为本地时间"""
+    if not timestamp:
+        return 'unknown'
+    return datetime.fromtimestamp(timestamp).strftime('%Y-%m-%d %H:%M')
+
+
+class TokenStatusStore(JsonStateFile):
+    """按账号记录登录 Cookie 的过期时间和最近一次认证结果，用于不发送请求地预检账号"""
+
+    def record(self, account_key, fingerprint, authenticated, expires_at=None):
+        """记录认证结果；认证成功时以本次的过期时间为准（None 表示未知），认证失败时保留之前记录的过期时间"""
+        with self.lock:
+            entry = self.data.get(account_key)
+            if not entry or entry.get('fingerprint') != fingerprint:
+                entry = {'fingerprint': fingerprint}
+            if authenticated and expires_at is None:
+                entry.pop('expires_at', None)
+            elif expires_at is not None:
+                entry['expires_at'] = expires_at
+            entry['auth'] = 'ok' if authenticated else 'failed'
+            entry['checked_at'] = time.time()
+            self.data[account_key] = entry
+            self.mark_changed(account_key)
+
+    def classify(self, account_key, fingerprint, warning_seconds, now=None):
+        """返回 (状态, 记录)：状态为 live / expiring / expired；配置中的 Cookie 更新过或没有记录时视为 live"""
+        now = now or time.time()
+        with self.lock:
+            entry = self.data.get(account_key)
+            entry = dict(entry) if entry else None
+        if not entry or entry.get('fingerprint') != fingerprint:
+            return 'live', None
+
+        expires_at = entry.get('expires_at')
+        if entry.get('auth') == 'failed' or (expires_at and expires_at <= now):
+            return 'expired', entry
+        if expires_at and expires_at - now <= warning_seconds:
+            return 'expiring', entry
+        return 'live', entry
@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+LeafLow shared HTTP transport
+多账号共享的连接池传输层
+
+所有账号的 requests.Session 挂载同一个 PooledTransport，
+在账号之间复用到 leaflow.net / checkin.leaflow.net 的 TCP/TLS 连接，
+Cookie 和 Header 仍然保存在各自的 Session 中，互不影响。
+"""
+
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+from metrics import RequestRecord
+
+try:
+    # urllib3 只列出能够解码的编码：br / zstd 仅在安装了 brotli / zstandard 时出现
+    from urllib3.util.request import ACCEPT_ENCODING as _DECODABLE_ENCODINGS
+    ACCEPT_ENCODING = ', '.join(_DECODABLE_ENCODINGS.split(','))
+except ImportError:
+    ACCEPT_ENCODING = 'gzip, deflate'
+
+
+def _counting_pool(base, transport):
+    """生成在新建连接时计数的连接池类"""
+    class CountingPool(base):
+        def _new_conn(self):
+            transport.count('connections_opened')
+            return super()._new_conn()
+
+    CountingPool.__name__ = f"Counting{base.__name__}"
+    return CountingPool
+
+
+class PooledTransport(HTTPAdapter):
+    """按主机维护连接池的共享适配器，并统计连接的新建与复用次数"""
+
+    def __init__(self, pool_connections=10, pool_maxsize=10):
+        self.stats_lock = threading.Lock()
+        self.counters = {'requests_sent': 0, 'connections_opened': 0}
+        self.pool_classes = {
+            'http': _counting_pool(HTTPConnectionPool, self),
+            'https': _counting_pool(HTTPSConnectionPool, self),
+        }
+        super().__init__(pool_connections=pool_connections, pool_maxsize=pool_maxsize)
+
+    def init_poolmanager(self, connections, maxsize, block=False, **pool_kwargs):
+        super().init_poolmanager(connections, maxsize, block=block, **pool_kwargs)
+        self.poolmanager.pool_classes_by_scheme = self.pool_classes
+
+    def proxy_manager_for(self, proxy, **proxy_kwargs):
+        """每个 HTTP(S) 代理一个连接池管理器，同样统计新建连接（SOCKS 代理使用其自带的连接池）"""
+        manager = super().proxy_manager_for(proxy, **proxy_kwargs)
+        if not proxy.lower().startswith('socks'):
+            manager.pool_classes_by_scheme = self.pool_classes
+        return manager
+
+    def count(self, name, amount=1):
+        """线程安全地累加计数器"""
+        with self.stats_lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def send(self, request, **kwargs):
+        self.count('requests_sent')
+        return super().send(request, **kwargs)
+
+    def stats(self):
+        """返回连接统计：新建连接数、复用连接数、请求总数"""
+        with self.stats_lock:
+            counters = dict(self.counters)
+        opened = counters['connections_opened']
+        counters['connections_reused'] = max(0, counters['requests_sent'] - opened)
+        return counters
+
+    def close(self):
+        """Session.close() 会关闭所有挂载的适配器，共享连接池需要保留，因此忽略"""
+
+    def shutdown(self):
+        """真正关闭连接池，由 LeafLowTokenCheckin.shutdown() 在进程退出前调用"""
+        super().close()
+
+
+class DeadlineExceeded(Exception):
+    """账号或整次运行的时间预算已用完"""
+
+
+class AccountSession(requests.Session):
+    """单个账号的会话：记录账号标识、每个请求的阶段与耗时，并缓存本次运行中已获取的页面"""
+
+    def __init__(self, account_key=None, timeout=None):
+        super().__init__()
+        self.account_key = account_key
+        self.request_count = 0
+        self.page_cache = {}
+        # 当前所处阶段，由调用方设置（auth_probe / checkin_page / checkin_submit / api_endpoint）
+        self.phase = None
+        self.request_log = []
+        # 默认的 (连接超时, 读取超时)，以及 time.monotonic() 表示的截止时间
+        self.timeout = timeout
+        self.deadline = None
+        self.deadline_message = None
+        # 所有账号共享的按主机限速（rate_limiter.RateController），为 None 时不限速
+        self.rate_controller = None
+        # 收到 429 后等待 Retry-After 并重发的最多次数（服务器未处理该请求，重发是安全的）
+        self.throttle_retries = 0
+        # 账号使用的出口代理 URL，为 None 时直连
+        self.proxy = None
+        # 认证探测是否被重定向到了登录页（Cookie 确已失效的依据）
+        self.login_redirected = False
+
+    def set_deadline(self, deadline, message):
+        self.deadline = deadline
+        self.deadline_message = message
+
+    def remaining(self):
+        """距截止时间的秒数，未设置截止时间时返回 None"""
+        if self.deadline is None:
+            return None
+        return self.deadline - time.monotonic()
+
+    def budget_timeout(self, timeout):
+        """按剩余时间收紧请求超时；预算已用完时抛出 DeadlineExceeded"""
+        if timeout is None:
+            timeout = self.timeout
+        remaining = self.remaining()
+        if remaining is None:
+            return timeout
+        if remaining <= 0:
+            raise DeadlineExceeded(self.deadline_message)
+        if timeout is None:
+            return remaining
+        if isinstance(timeout, tuple):
+            return tuple(remaining if part is None else min(part, remaining) for part in timeout)
+        return min(timeout, remaining)
+
+    def send(self, request, **kwargs):
+        attempt = 0
+        while True:
+            response = self.send_once(request, **kwargs)
+            if response.status_code != 429 or self.rate_controller is None or attempt >= self.throttle_retries:
+                return response
+            # 限速器已记录 Retry-After，下一次 acquire 会等到暂停结束
+            response.close()
+            attempt += 1
+
+    def send_once(self, request, **kwargs):
+        if self.rate_controller is not None:
+            self.rate_controller.acquire(request.url, self.remaining(), via=self.proxy)
+        kwargs['timeout'] = self.budget_timeout(kwargs.get('timeout'))
+
+        # 重定向也会经过 send，因此这里统计的是真实的 HTTP 请求数
+        self.request_count += 1
+        record = RequestRecord(self.phase, request.method, request.url)
+        index = len(self.request_log)
+        self.request_log.append(record)
+
+        started = time.perf_counter()
+        try:
+            response = super().send(request, **kwargs)
+        except Exception as e:
+            record.error = f"{type(e).__name__}: {e}"
+            # 因预算收紧而超时，不算作端点故障
+            remaining = self.remaining()
+            if isinstance(e, requests.Timeout) and remaining is not None and remaining < 0.1:
+                raise DeadlineExceeded(self.deadline_message) from e
+            if isinstance(e, requests.Timeout) and self.rate_controller is not None:
+                self.rate_controller.observe_timeout(request.url, via=self.proxy)
+            raise
+        finally:
+            # 扣除重定向产生的嵌套请求耗时，它们各自另有记录
+            nested = sum(child.elapsed for child in self.request_log[index + 1:])
+            record.elapsed = time.perf_counter() - started - nested
+
+        first_hop = response.history[0] if response.history else response
+        record.status = first_hop.status_code
+        record.response = first_hop
+        if self.rate_controller is not None:
+            self.rate_controller.observe(
+                request.url, first_hop.status_code, first_hop.headers.get('Retry-After'), via=self.proxy,
+            )
+        return response
+
+    def clear_page_cache(self):
+        """丢弃已缓存的页面，关闭尚未读完的响应"""
+        pages = list(self.page_cache.values())
+        self.page_cache.clear()
+        for page in pages:
+            page.close()
+
+    def close(self):
+        self.clear_page_cache()
+        super().close()